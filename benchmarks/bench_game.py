@@ -0,0 +1,230 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "src")]
+os.chdir(ROOT)
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+import numpy as np
+import pygame as py
+
+from src.diagnostics import memory
+from src.game import CELL_SIZE, Game
+from src.models.components.renderable_c import Animation, RenderableComponent, DIRECTION_SOUTH
+from src.models.entities.entity import Entity
+from src.models.tilemaps import tilemap_format
+from src.models.tilemaps.tilemap import Tilemap
+from src.models.tilemaps.tilemap_format import TILE_DTYPE, TilemapData
+
+MAP_SIZES = [50, 200, 500, 1000, 2000]
+ENTITY_COUNTS = [10, 100, 1000, 10000, 50000]
+FRAMES = 300
+SAVE_EVERY = 60
+SEED = 1234
+SAVE_SLOT = "bench"
+TILESET = "overworld.json"
+RESULTS_DIR = "benchmarks/results"
+
+# walk a square so the camera and dirty rects move every few frames
+SCRIPT = [py.K_d] * 6 + [py.K_s] * 6 + [py.K_a] * 6 + [py.K_w] * 6
+STEPS = np.array([(0, 1), (-1, 0), (1, 0), (0, -1)], dtype=np.int32)
+PHASES = ("input", "update", "render", "render_map", "save", "save_flush")
+
+
+def write_map(directory: str, size: int, rng: np.random.Generator) -> str:
+    tiles = rng.integers(0, 32, (size, size)).astype(TILE_DTYPE)
+    pathable = rng.random((size, size)) > 0.1
+    pathable[:16, :16] = True
+    path = os.path.join(directory, "bench_%d%s" % (size, tilemap_format.BINARY_EXT))
+    tilemap_format.save_binary(path, TilemapData(size, size, TILESET, tiles, pathable))
+    return path
+
+
+class BenchGame(Game):
+
+    def __init__(self, map_path: str, entity_count: int, frames: int, rng: np.random.Generator):
+        self.map_path = map_path
+        self.entity_count = entity_count
+        self.frames = frames
+        self.rng = rng
+        self.timings = {name: [] for name in PHASES}
+        self.result = None
+        Game.__init__(self, headless=True, use_ecs=True, save_file=SAVE_SLOT)
+
+    def open_tilemap(self, filename: str) -> Tilemap:
+        return Tilemap(self.map_path, CELL_SIZE)
+
+    def load_player(self) -> bool:
+        return False
+
+    def hydrate_entities(self, map_name: str):
+        size = self.tm.width
+        a = Animation("characters.png", (0, 0), 3, 4, 32, CELL_SIZE)
+        for i in range(self.entity_count):
+            pos = int(self.rng.integers(size)), int(self.rng.integers(size))
+            e = Entity(100 + i, "npc", pos, False)
+            e.add_component(RenderableComponent(1, None, DIRECTION_SOUTH, Animation.from_json(a.to_json())))
+            self.world.add_entity(e)
+
+    def wander(self):
+        # every entity picks a random step each tick, the batched move resolves them
+        for arch in self.world.ecs.archetypes.values():
+            n = arch.count
+            arch.velocity[:n] = STEPS[self.rng.integers(0, 4, n)]
+
+    def render_map(self):
+        start = time.perf_counter()
+        Game.render_map(self)
+        self.timings["render_map"][-1] += time.perf_counter() - start
+
+    def timed(self, name: str, fn, *args):
+        start = time.perf_counter()
+        fn(*args)
+        self.timings[name][-1] += time.perf_counter() - start
+
+    def loop(self):
+        for name in PHASES:
+            self.timings[name] = []
+        start = time.perf_counter()
+        for frame in range(self.frames):
+            for name in PHASES:
+                self.timings[name].append(0.0)
+            ticks = self.scheduler.begin_frame()
+            py.event.post(py.event.Event(py.KEYDOWN, key=SCRIPT[frame % len(SCRIPT)]))
+            self.timed("input", self.handle_input)
+            for _ in range(ticks):
+                self.wander()
+                self.timed("update", self.update)
+            # measure full repaints, not whatever the dirty rects happen to allow
+            self.dirty.mark_full()
+            self.timed("render", self.render)
+            if frame % SAVE_EVERY == SAVE_EVERY - 1:
+                self.timed("save", self.save_tilemap)
+                self.timed("save_flush", self.saver.flush)
+            self.scheduler.end_frame()
+        elapsed = time.perf_counter() - start
+        report = memory.report(self)
+        current = report["maps"][self.current_tilemap]
+        self.result = {
+            "frames": self.frames,
+            "seconds": elapsed,
+            "fps": self.frames / elapsed,
+            "phases": {name: summarize(values) for name, values in self.timings.items()},
+            "memory": {
+                "entity_bytes": current["entities"]["bytes"],
+                "tiles_bytes": current["tiles_bytes"] + current["pathable_bytes"],
+                "tileset_bytes": current["tileset_bytes"],
+                "ecs_bytes": current["ecs_bytes"]
+            }
+        }
+        self.preloader.shutdown()
+        self.path_queue.shutdown()
+        self.saver.close()
+
+
+def summarize(values: [float]) -> {}:
+    ms = np.array(values) * 1000
+    return {
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+        "total_ms": float(ms.sum())
+    }
+
+
+def run_case(directory: str, size: int, entity_count: int, frames: int) -> {}:
+    rng = np.random.default_rng(SEED)
+    map_path = write_map(directory, size, rng)
+    game = BenchGame(map_path, entity_count, frames, rng)
+    result = game.result
+    result["map_size"] = size
+    result["entities"] = entity_count
+    return result
+
+
+def git_revision() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def cases(maps: [int], entities: [int], full: bool) -> [(int, int)]:
+    # the full grid is slow, by default each axis is swept with the other held small
+    if full:
+        return [(m, e) for m in maps for e in entities]
+    out = [(m, entities[min(1, len(entities) - 1)]) for m in maps]
+    out += [(maps[min(1, len(maps) - 1)], e) for e in entities]
+    return list(dict.fromkeys(out))
+
+
+def compare(previous: {}, current: {}):
+    old = {(r["map_size"], r["entities"]): r for r in previous["results"]}
+    for r in current["results"]:
+        o = old.get((r["map_size"], r["entities"]))
+        if o is None:
+            continue
+        print("%5d map %6d entities: fps %7.1f -> %7.1f (%+.1f%%)" % (
+            r["map_size"], r["entities"], o["fps"], r["fps"], (r["fps"] / o["fps"] - 1) * 100))
+
+
+def parse_sizes(text: str) -> [int]:
+    return [int(v) for v in text.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="headless game loop benchmarks")
+    parser.add_argument("--maps", type=parse_sizes, default=MAP_SIZES, help="comma separated map sizes")
+    parser.add_argument("--entities", type=parse_sizes, default=ENTITY_COUNTS, help="comma separated entity counts")
+    parser.add_argument("--frames", type=int, default=FRAMES)
+    parser.add_argument("--full", action="store_true", help="run every map size with every entity count")
+    parser.add_argument("--out", help="result file, defaults to benchmarks/results/<revision>.json")
+    parser.add_argument("--compare", help="earlier result file to compare fps against")
+    args = parser.parse_args()
+
+    py.init()
+    revision = git_revision()
+    results = []
+    directory = tempfile.mkdtemp(prefix="bench-maps-")
+    try:
+        for size, entity_count in cases(args.maps, args.entities, args.full):
+            r = run_case(directory, size, entity_count, args.frames)
+            results.append(r)
+            print("%5d map %6d entities: %7.1f fps, render %.2f ms, update %.2f ms, save %.2f ms" % (
+                size, entity_count, r["fps"], r["phases"]["render"]["mean_ms"],
+                r["phases"]["update"]["mean_ms"], r["phases"]["save"]["total_ms"]))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+        shutil.rmtree(os.path.join("saves", SAVE_SLOT), ignore_errors=True)
+
+    out = {
+        "revision": revision,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pygame": py.version.ver,
+        "platform": platform.platform(),
+        "results": results
+    }
+    path = args.out or os.path.join(RESULTS_DIR, revision + ".json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(out, f, indent=2)
+    print("wrote " + path)
+    if args.compare:
+        with open(args.compare, "r") as f:
+            compare(json.load(f), out)
+
+
+if __name__ == '__main__':
+    main()
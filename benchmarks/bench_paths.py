@@ -0,0 +1,99 @@
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "src")]
+
+import numpy as np
+
+from src.models.tilemaps.tile_grid import TileGrid
+from src.world.collision import CollisionGrid
+from src.world.path_queue import PathQueue
+from src.world.pathfinding import Pathfinder
+from src.world.world import World
+
+MAP_SIZES = [200, 1000]
+AGENTS = [10, 50]
+FRAME_WORK = 0.004
+TARGET_FPS = 60
+SEED = 1234
+
+
+def frame_work(seconds: float) -> int:
+    # stands in for update and render, plain python so it needs the gil like the real loop
+    start = time.perf_counter()
+    n = 0
+    while time.perf_counter() - start < seconds:
+        for i in range(200):
+            n += i
+    return n
+
+
+def run_case(size: int, agents: int) -> {}:
+    rng = np.random.default_rng(SEED)
+    grid = TileGrid.blank(size, size, "bench")
+    grid.pathable[:] = rng.random((size, size)) > 0.25
+    world = World()
+    world.set_collision(CollisionGrid(grid))
+    pathfinder = Pathfinder(grid, world)
+    queue = PathQueue()
+    queue.reset(pathfinder)
+    # workers are started and have built their tables before timing starts
+    queue.request("warm", (0, 0), (1, 1))
+    while queue.pending():
+        queue.deliver()
+        time.sleep(0.01)
+
+    free = np.argwhere(grid.pathable)
+    for i in range(agents):
+        a, b = free[rng.integers(len(free))], free[rng.integers(len(free))]
+        queue.request(i, (int(a[1]), int(a[0])), (int(b[1]), int(b[0])))
+
+    # latency is measured from when each frame was due, so waiting on the gil after a sleep counts
+    latency = []
+    start = time.perf_counter()
+    frame = 0
+    while queue.pending():
+        due = start + frame / TARGET_FPS
+        frame += 1
+        rest = due - time.perf_counter()
+        if rest > 0:
+            time.sleep(rest)
+        queue.deliver()
+        frame_work(FRAME_WORK)
+        latency.append(time.perf_counter() - due)
+    elapsed = time.perf_counter() - start
+    queue.shutdown()
+    ms = np.array(latency) * 1000
+    return {
+        "map_size": size,
+        "agents": agents,
+        "frames": len(ms),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "max_ms": float(ms.max()),
+        "deliver_s": elapsed
+    }
+
+
+def parse_sizes(text: str) -> [int]:
+    return [int(v) for v in text.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="frame latency while the path queue is busy")
+    parser.add_argument("--maps", type=parse_sizes, default=MAP_SIZES, help="comma separated map sizes")
+    parser.add_argument("--agents", type=parse_sizes, default=AGENTS, help="comma separated request counts")
+    args = parser.parse_args()
+    print("idle frame %.1f ms" % (FRAME_WORK * 1000))
+    for size in args.maps:
+        for agents in args.agents:
+            r = run_case(size, agents)
+            print("%5d map %4d agents: frame p50 %.1f ms, p95 %.1f ms, max %.1f ms, %d frames, %.2f s to deliver" % (
+                size, agents, r["p50_ms"], r["p95_ms"], r["max_ms"], r["frames"], r["deliver_s"]))
+
+
+if __name__ == '__main__':
+    main()
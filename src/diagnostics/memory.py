@@ -0,0 +1,107 @@
+import sys
+
+import numpy as np
+import pygame as py
+
+from src.models.entities.entity import Entity
+from src.models.tilemaps.tilemap import Tilemap
+
+# references to shared state that must not be charged to the object holding them
+SHARED_ATTRS = {"world", "store", "owner", "frames", "surface"}
+
+
+def slot_names(obj) -> [str]:
+    names = []
+    for cls in type(obj).__mro__:
+        names.extend(getattr(cls, "__slots__", ()))
+    return names
+
+
+def deep_size(obj, seen: set = None) -> int:
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or isinstance(obj, (type, py.Surface)):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, np.ndarray):
+        return size if obj.base is None else size + obj.nbytes
+    if isinstance(obj, dict):
+        return size + sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(deep_size(v, seen) for v in obj)
+    for name in slot_names(obj):
+        if name not in SHARED_ATTRS and hasattr(obj, name):
+            size += deep_size(getattr(obj, name), seen)
+    if hasattr(obj, "__dict__"):
+        size += deep_size({k: v for k, v in vars(obj).items() if k not in SHARED_ATTRS}, seen)
+    return size
+
+
+def surface_bytes(surfaces: [py.Surface]) -> int:
+    # subsurfaces share their parent's pixels, so each root surface is counted once
+    roots = {}
+    for s in surfaces:
+        while s.get_parent() is not None:
+            s = s.get_parent()
+        roots[id(s)] = s
+    return sum(s.get_width() * s.get_height() * s.get_bytesize() for s in roots.values())
+
+
+def entity_report(entities: [Entity]) -> {}:
+    per_component = {}
+    total = 0
+    for e in entities:
+        total += deep_size(e)
+        for c in e.components.values():
+            stats = per_component.setdefault(c.key, [0, 0])
+            stats[0] += 1
+            stats[1] += deep_size(c)
+    return {
+        "entities": len(entities),
+        "bytes": total,
+        "bytes_per_entity": total / len(entities) if entities else 0,
+        "components": {k: {"count": n, "bytes": b, "bytes_per_component": b / n} for k, (n, b) in per_component.items()}
+    }
+
+
+def ecs_bytes(world) -> int:
+    if world.ecs is None:
+        return 0
+    return sum(arr.nbytes for arch in world.ecs.archetypes.values()
+               for arr in (arch.pos, arch.velocity, arch.direction, arch.frame, arch.frame_count, arch.pathable))
+
+
+def map_report(tm: Tilemap, entities: [Entity], ecs: int = 0) -> {}:
+    return {
+        "tiles_bytes": tm.tiles.nbytes,
+        "pathable_bytes": tm.pathable.nbytes,
+        "tileset_bytes": surface_bytes(tm.tileset),
+        "ecs_bytes": ecs,
+        "entities": entity_report(entities)
+    }
+
+
+def report(game) -> {}:
+    maps = {game.current_tilemap: map_report(game.tm, game.world.entities, ecs_bytes(game.world))}
+    for name, entities in game.hydrated.items():
+        if name != game.current_tilemap:
+            maps[name] = {"entities": entity_report(entities)}
+    return {
+        "player_bytes": deep_size(game.player),
+        "maps": maps
+    }
+
+
+def format_report(r: {}) -> str:
+    lines = ["player: %d bytes" % r["player_bytes"]]
+    for name, m in r["maps"].items():
+        e = m["entities"]
+        line = "%s: %d entities, %d bytes (%.0f per entity)" % (name, e["entities"], e["bytes"], e["bytes_per_entity"])
+        if "tiles_bytes" in m:
+            line += ", tiles %d, pathable %d, tileset %d, ecs %d bytes" % (m["tiles_bytes"], m["pathable_bytes"],
+                                                                           m["tileset_bytes"], m["ecs_bytes"])
+        lines.append(line)
+        for key, c in e["components"].items():
+            lines.append("  %s: %d x %.0f bytes" % (key, c["count"], c["bytes_per_component"]))
+    return "\n".join(lines)
@@ -0,0 +1,208 @@
+import csv
+import json
+import os
+import time
+from collections import deque
+
+import pygame as py
+
+HISTORY_FRAMES = 240
+WORST_FRAMES = 5
+MAX_TRACE_EVENTS = 500000
+HISTOGRAM_MS = (4, 8, 16, 33, 50, 100)
+OVERLAY_SIZE = 300, 300
+OVERLAY_BG = (0, 0, 0, 180)
+OVERLAY_FG = (255, 255, 255)
+OVERLAY_BAR = (80, 200, 120)
+
+
+class Scope:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler: 'Profiler', name: str):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = self.profiler.clock()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, self.profiler.clock())
+        return False
+
+
+class NullScope:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SCOPE = NullScope()
+
+
+class FrameStats:
+    __slots__ = ("index", "start", "duration", "scopes", "counters")
+
+    def __init__(self, index: int, start: float, duration: float, scopes: {str: float}, counters: {str: int}):
+        self.index = index
+        self.start = start
+        self.duration = duration
+        self.scopes = scopes
+        self.counters = counters
+
+
+class Profiler:
+
+    def __init__(self, clock=time.perf_counter, history: int = HISTORY_FRAMES):
+        self.clock = clock
+        self.enabled = False
+        self.recording = False
+        self.history: deque = deque(maxlen=history)
+        self.worst: [FrameStats] = []
+        self.recorded: [FrameStats] = []
+        self.events: [(str, float, float)] = []
+        self.frame_index = 0
+        self.frame_start = 0.0
+        self.scopes: {str: float} = {}
+        self.counters: {str: int} = {}
+        self.font: py.font.Font = None
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.reset()
+
+    def reset(self):
+        self.history.clear()
+        self.worst = []
+        self.scopes = {}
+        self.counters = {}
+
+    def start_recording(self):
+        self.enabled = True
+        self.recording = True
+        self.recorded = []
+        self.events = []
+
+    def stop_recording(self):
+        self.recording = False
+
+    def scope(self, name: str):
+        # disabled profiling costs one attribute check and no allocation
+        if not self.enabled:
+            return NULL_SCOPE
+        return Scope(self, name)
+
+    def count(self, name: str, n: int = 1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def record(self, name: str, start: float, end: float):
+        self.scopes[name] = self.scopes.get(name, 0.0) + end - start
+        if self.recording and len(self.events) < MAX_TRACE_EVENTS:
+            self.events.append((name, start, end - start))
+
+    def begin_frame(self):
+        self.frame_start = self.clock()
+        self.scopes = {}
+        self.counters = {}
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        stats = FrameStats(self.frame_index, self.frame_start, self.clock() - self.frame_start,
+                           self.scopes, self.counters)
+        self.frame_index += 1
+        self.history.append(stats)
+        if self.recording:
+            self.recorded.append(stats)
+        if len(self.worst) < WORST_FRAMES or stats.duration > self.worst[-1].duration:
+            self.worst.append(stats)
+            self.worst.sort(key=lambda f: f.duration, reverse=True)
+            del self.worst[WORST_FRAMES:]
+
+    def histogram(self) -> [(str, int)]:
+        bins = [0] * (len(HISTOGRAM_MS) + 1)
+        for f in self.history:
+            ms = f.duration * 1000
+            i = 0
+            while i < len(HISTOGRAM_MS) and ms >= HISTOGRAM_MS[i]:
+                i += 1
+            bins[i] += 1
+        labels = ["<%d" % ms for ms in HISTOGRAM_MS] + [">=%d" % HISTOGRAM_MS[-1]]
+        return list(zip(labels, bins))
+
+    def averages(self) -> ({str: float}, {str: float}):
+        # mean milliseconds per scope and mean count per counter over the rolling window
+        n = len(self.history) or 1
+        scopes, counters = {}, {}
+        for f in self.history:
+            for name, t in f.scopes.items():
+                scopes[name] = scopes.get(name, 0.0) + t * 1000 / n
+            for name, c in f.counters.items():
+                counters[name] = counters.get(name, 0) + c / n
+        return scopes, counters
+
+    def dump_chrome_trace(self, path: str):
+        # load in chrome://tracing or ui.perfetto.dev
+        events = [{"name": name, "ph": "X", "ts": start * 1e6, "dur": duration * 1e6, "pid": 0, "tid": 0}
+                  for name, start, duration in self.events]
+        for f in self.recorded:
+            events.append({"name": "frame", "ph": "X", "ts": f.start * 1e6, "dur": f.duration * 1e6,
+                           "pid": 0, "tid": 1, "args": {"index": f.index}})
+            if f.counters:
+                events.append({"name": "counters", "ph": "C", "ts": f.start * 1e6, "pid": 0, "args": f.counters})
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as out:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, out)
+
+    def dump_csv(self, path: str):
+        scopes = sorted({name for f in self.recorded for name in f.scopes})
+        counters = sorted({name for f in self.recorded for name in f.counters})
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", newline="") as out:
+            writer = csv.writer(out)
+            writer.writerow(["frame", "frame_ms"] + [s + "_ms" for s in scopes] + counters)
+            for f in self.recorded:
+                writer.writerow([f.index, "%.3f" % (f.duration * 1000)] +
+                                ["%.3f" % (f.scopes.get(s, 0.0) * 1000) for s in scopes] +
+                                [f.counters.get(c, 0) for c in counters])
+
+    def overlay_rect(self) -> py.Rect:
+        return py.Rect((0, 0), OVERLAY_SIZE)
+
+    def render_overlay(self) -> py.Surface:
+        if self.font is None:
+            py.font.init()
+            self.font = py.font.SysFont(None, 18)
+        panel = py.Surface(OVERLAY_SIZE, py.SRCALPHA)
+        panel.fill(OVERLAY_BG)
+        frames = [f.duration * 1000 for f in self.history]
+        lines = []
+        if frames:
+            lines.append("frame %.2f ms avg, %.2f ms max" % (sum(frames) / len(frames), max(frames)))
+        scopes, counters = self.averages()
+        lines += ["%s %.2f ms" % (name, t) for name, t in sorted(scopes.items(), key=lambda s: -s[1])]
+        lines += ["%s %.1f" % (name, c) for name, c in sorted(counters.items())]
+        lines.append("worst " + ", ".join("#%d %.1f" % (f.index, f.duration * 1000) for f in self.worst))
+        y = 4
+        for line in lines:
+            panel.blit(self.font.render(line, True, OVERLAY_FG), (4, y))
+            y += 14
+
+        hist = self.histogram()
+        top = max(c for _, c in hist) or 1
+        bar_w = (OVERLAY_SIZE[0] - 8) // len(hist)
+        base = OVERLAY_SIZE[1] - 14
+        for i, (label, c) in enumerate(hist):
+            h = int(40 * c / top)
+            py.draw.rect(panel, OVERLAY_BAR, (4 + i * bar_w, base - h, bar_w - 2, h))
+            panel.blit(self.font.render(label, True, OVERLAY_FG), (4 + i * bar_w, base + 1))
+        return panel
+
+
+profiler = Profiler()
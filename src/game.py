@@ -1,3 +1,6 @@
+import os
+import time
+
 import pygame as py
 
 from models.tilemaps.tilemap import Tilemap
@@ -5,6 +8,20 @@ from src.models.components.renderable_c import *
 from src.models.components.trigger_c import *
 from src.models.entities.entity import Entity
 from src.models.entities.player import Player
+from src.diagnostics import memory
+from src.diagnostics.profiler import profiler
+from src.input_replay import InputRecorder, InputReplayer, REPLAY_SLOT, TOOL_KEYS
+from src.persistence.save_journal import SaveJournal
+from src.persistence.save_loader import SaveLoader
+from src.persistence.save_writer import SaveWriter
+from src.rendering.chunk_renderer import ChunkRenderer
+from src.rendering.dirty_rects import DirtyRects
+from src.scheduler import FixedClock, Scheduler, TICK_RATE
+from src.world.collision import CollisionGrid
+from src.world.map_preloader import MapPreloader
+from src.world.path_queue import PathQueue
+from src.world.pathfinding import Pathfinder
+from src.world.world import World
 
 MAP_SIZE = 21
 CELL_SIZE = 40
@@ -13,119 +30,329 @@ DIMS = MAP_SIZE * CELL_SIZE, MAP_SIZE * CELL_SIZE
 COLOR_WHITE = (255, 255, 255)
 COLOR_BLACK = (0, 0, 0)
 
+MAX_QUEUED_KEYS = 8
+
+STEP_DIRECTIONS = {
+    (0, 1): DIRECTION_SOUTH,
+    (-1, 0): DIRECTION_WEST,
+    (1, 0): DIRECTION_EAST,
+    (0, -1): DIRECTION_NORTH
+}
+
 
 class Game:
 
-    def __init__(self):
+    def __init__(self, headless: bool = False, max_frames: int = None, use_ecs: bool = False,
+                 save_file: str = "one", recorder: InputRecorder = None, replayer: InputReplayer = None):
+        if headless:
+            # no window, set_mode hands back an offscreen surface
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+        self.headless = headless
+        self.max_frames = max_frames
         self.screen: py.Surface = py.display.set_mode(DIMS)
         self.running: bool = True
+        self.dirty = DirtyRects(self.screen.get_rect())
+        self.recorder = recorder
+        self.replayer = replayer
+        if headless or (replayer is not None and replayer.fast):
+            clock = FixedClock()
+            self.scheduler = Scheduler(clock=clock, sleep=clock.sleep)
+        else:
+            self.scheduler = Scheduler()
+        self.key_queue: [int] = []
         self.cam: [int, int] = [0, 0]
-        self.save_file = "one"
+        self.save_file = save_file
+        if replayer is not None:
+            # replays run from a scratch copy of the slot the recording started from
+            self.save_file = REPLAY_SLOT
+            replayer.restore_slot("saves/" + REPLAY_SLOT)
+        if recorder is not None:
+            recorder.open("saves/" + self.save_file, TICK_RATE)
+        self.saver = SaveWriter()
+        self.journal = SaveJournal("saves/" + self.save_file, self.saver)
+        self.incremental_saves = True
+        self.loader = SaveLoader("saves/" + self.save_file, self.journal)
         self.current_tilemap = "start.json"
-        self.tm: Tilemap = Tilemap("resources/maps/tm/" + self.current_tilemap, CELL_SIZE)
-        self.entities = []
+        self.tm: Tilemap = None
+        self.map_renderer: ChunkRenderer = None
+        self.pathfinder: Pathfinder = None
+        self.path_queue = PathQueue()
+        self.path_queue.wait = recorder is not None or replayer is not None
+        self.player_path: [(int, int)] = []
+        self.preloader = MapPreloader(self.open_tilemap)
+        self.world = World(use_ecs)
+        self.hydrated: {str: [Entity]} = {}
         self.player: Player = None
         self.center_on_pos((10, 10))
-        self.generate_test()
+        if not self.load_player():
+            self.generate_test()
+        self.load_tilemap(self.current_tilemap)
+        self.hydrate_entities(self.current_tilemap)
+        self.center_on_player()
         self.loop()
 
     def loop(self):
         while self.running:
-            self.render()
-            self.handle_input()
+            profiler.begin_frame()
+            ticks = self.scheduler.begin_frame()
+            with profiler.scope("handle_input"):
+                self.handle_input()
+            for _ in range(ticks):
+                if self.replayer is not None:
+                    for event in self.replayer.events_for(self.scheduler.tick_count):
+                        self.handle_event(event)
+                with profiler.scope("update"):
+                    self.update()
+                self.check_state()
+            if profiler.enabled:
+                self.dirty.mark(profiler.overlay_rect())
+            with profiler.scope("render"):
+                self.render()
+            profiler.end_frame()
+            self.scheduler.end_frame()
+            if self.replayer is not None:
+                self.replayer.frame_times.append(self.scheduler.last_frame_time)
+            if self.max_frames is not None and self.scheduler.frame_count >= self.max_frames:
+                self.running = False
+        if self.recorder is not None:
+            self.recorder.close(self.scheduler.tick_count)
+        self.preloader.shutdown()
+        self.path_queue.shutdown()
+        self.saver.close()
+
+    def update(self):
+        self.scheduler.tick()
+        for owner, path in self.path_queue.deliver():
+            if owner is self.player:
+                self.take_player_path(path)
+        self.world.update(self.tm.pathable, (self.player.xy(),))
+        while self.key_queue and self.scheduler.take_event():
+            self.handle_key(self.key_queue.pop(0))
+        if self.player_path and self.scheduler.take_event():
+            self.step_player()
+
+    def check_state(self):
+        tick = self.scheduler.tick_count
+        if self.recorder is not None:
+            self.recorder.record_state(tick, self)
+        if self.replayer is not None:
+            self.replayer.check_state(tick, self)
+            if self.replayer.finished(tick):
+                self.running = False
 
     def render_map(self):
-        for y in range(MAP_SIZE):
-            for x in range(MAP_SIZE):
-                p = self.map_to_cam_pos((x, y))
-                rect = self.rect_from_pos((x, y))
-                if self.tm.is_in_bounds(p):
-                    surface = self.tm.surface_at(p)
-                    self.screen.blit(surface, rect)
-                else:
-                    self.screen.blit(self.tm.fill_surf, rect)
-
-    def render(self):
-        self.screen.fill(COLOR_WHITE)
-        self.render_map()
-        r = self.player.get_component_by_key(RENDER_COMPONENT_KEY)
-        xy = self.player.xy()[0] - self.cam[0], self.player.xy()[1] - self.cam[1]
-        # xy = self.map_to_cam_pos(r.xy())
-        rect = py.Rect(abs(xy[0] * CELL_SIZE), abs(xy[1] * CELL_SIZE), CELL_SIZE, CELL_SIZE)
-        self.screen.blit(r.get_renderable(), rect)
-        py.display.flip()
+        with profiler.scope("render_map"):
+            self.map_renderer.render(self.screen, self.cam, MAP_SIZE, MAP_SIZE)
+
+    def render(self) -> bool:
+        if not self.dirty.is_dirty():
+            return False
+        rects = self.dirty.take()
+        overlay = profiler.render_overlay() if profiler.enabled else None
+        for dirty_rect in rects:
+            self.screen.set_clip(dirty_rect)
+            self.screen.fill(COLOR_WHITE)
+            self.render_map()
+            r = self.player.get_component_by_key(RENDER_COMPONENT_KEY)
+            xy = self.player.xy()[0] - self.cam[0], self.player.xy()[1] - self.cam[1]
+            # xy = self.map_to_cam_pos(r.xy())
+            rect = py.Rect(abs(xy[0] * CELL_SIZE), abs(xy[1] * CELL_SIZE), CELL_SIZE, CELL_SIZE)
+            self.screen.blit(r.get_renderable(), rect)
+            if overlay is not None:
+                self.screen.blit(overlay, (0, 0))
+        self.screen.set_clip(None)
+        py.display.update(rects)
+        return True
+
+    def mark_dirty_pos(self, p: (int, int)):
+        self.dirty.mark(self.rect_from_pos((p[0] - self.cam[0], p[1] - self.cam[1])))
+
+    def mark_dirty_region(self, x: int, y: int, width: int, height: int):
+        rect = self.rect_from_pos((x - self.cam[0], y - self.cam[1]))
+        rect.width, rect.height = width * self.tm.cs, height * self.tm.cs
+        self.dirty.mark(rect)
+
+    def mark_entity_dirty(self, entity: Entity):
+        self.mark_dirty_pos(entity.xy())
 
     def handle_input(self):
         for event in py.event.get():
-            if event.type == py.QUIT:
-                self.running = False
-            if event.type == py.KEYDOWN:
-                x, y = self.player.xy()
-                if event.key == py.K_s:
-                    self.try_move_player((x, y + 1), DIRECTION_SOUTH)
-                elif event.key == py.K_a:
-                    self.try_move_player((x - 1, y), DIRECTION_WEST)
-                elif event.key == py.K_d:
-                    self.try_move_player((x + 1, y), DIRECTION_EAST)
-                elif event.key == py.K_w:
-                    self.try_move_player((x, y - 1), DIRECTION_NORTH)
-                elif event.key == py.K_p:
-                    self.save_player()
+            is_input = event.type == py.MOUSEBUTTONDOWN or (event.type == py.KEYDOWN and event.key not in TOOL_KEYS)
+            if self.replayer is not None and is_input:
+                # the recording drives the game, live input would make it diverge
+                continue
+            if self.recorder is not None and is_input:
+                self.recorder.record_event(self.scheduler.tick_count, event)
+            self.handle_event(event)
+
+    def handle_event(self, event: py.event.Event):
+        if event.type == py.QUIT:
+            self.running = False
+        if event.type in (py.VIDEOEXPOSE, py.WINDOWEXPOSED, py.WINDOWRESTORED):
+            self.dirty.mark_full()
+        if event.type == py.KEYDOWN and event.key in TOOL_KEYS:
+            self.toggle_profiling(event.key)
+        elif event.type == py.KEYDOWN and len(self.key_queue) < MAX_QUEUED_KEYS:
+            self.key_queue.append(event.key)
+            self.path_queue.cancel(self.player)
+            self.player_path = []
+        if event.type == py.MOUSEBUTTONDOWN and event.button == 1:
+            self.walk_to(self.map_to_cam_pos((event.pos[0] // self.tm.cs, event.pos[1] // self.tm.cs)))
+
+    def handle_key(self, key: int):
+        x, y = self.player.xy()
+        if key == py.K_s:
+            self.try_move_player((x, y + 1), DIRECTION_SOUTH)
+        elif key == py.K_a:
+            self.try_move_player((x - 1, y), DIRECTION_WEST)
+        elif key == py.K_d:
+            self.try_move_player((x + 1, y), DIRECTION_EAST)
+        elif key == py.K_w:
+            self.try_move_player((x, y - 1), DIRECTION_NORTH)
+        elif key == py.K_p:
+            self.save_player()
+        elif key == py.K_m:
+            print(memory.format_report(memory.report(self)))
+
+    def toggle_profiling(self, key: int):
+        # F3 shows the overlay, F4 starts and stops a recorded trace
+        if key == py.K_F3:
+            profiler.toggle()
+        elif profiler.recording:
+            profiler.stop_recording()
+            name = time.strftime("profiles/%Y%m%d-%H%M%S")
+            profiler.dump_chrome_trace(name + ".json")
+            profiler.dump_csv(name + ".csv")
+            print("Wrote profile " + name)
+        else:
+            profiler.start_recording()
+        self.dirty.mark_full()
 
     def try_move_player(self, pos: (int, int), direction: int):
-        can_move = True
-        r: RenderableComponent = self.player.get_component_by_key(RENDER_COMPONENT_KEY)
-        entity = self.entity_at(pos)
-        if entity:
-            if entity.pathable:
+        with profiler.scope("try_move_player"):
+            r: RenderableComponent = self.player.get_component_by_key(RENDER_COMPONENT_KEY)
+            entity = self.entity_at(pos)
+            if entity and entity.pathable:
                 trigger = entity.get_component_by_key(TRIGGER_COMPONENT_KEY)
                 if trigger and trigger.type == TRIGGER_MOVE_TILEMAPS:
                     self.move_tilemap(trigger.payload)
                     return
-            else:
-                can_move = False
-        if self.tm.pathable_at(pos) and can_move:
-            self.player.pos = list(pos)
-        r.direction = direction
-        r.next_frame()
-        self.center_on_player()
+            self.mark_entity_dirty(self.player)
+            # tiles and non-pathable entities share one bit grid
+            if not self.world.is_blocked(pos):
+                self.player.pos = (pos[0], pos[1])
+            r.direction = direction
+            r.next_frame()
+            self.mark_entity_dirty(self.player)
+            self.center_on_player()
+
+    def walk_to(self, target: (int, int)):
+        # the old path is dropped now, stepping on while the new one is searched would strand it
+        self.player_path = []
+        self.path_queue.request(self.player, self.player.xy(), target)
+
+    def take_player_path(self, path: [(int, int)] or None):
+        if not path:
+            self.player_path = []
+            return
+        x, y = self.player.xy()
+        if (path[0][0] - x, path[0][1] - y) not in STEP_DIRECTIONS:
+            # searched from a cell the player has since left, ask again from where it stands
+            self.walk_to(path[-1])
+            return
+        self.player_path = path
+
+    def step_player(self):
+        x, y = self.player.xy()
+        nxt = self.player_path.pop(0)
+        if (nxt[0] - x, nxt[1] - y) not in STEP_DIRECTIONS:
+            self.player_path = []
+            return
+        self.try_move_player(nxt, STEP_DIRECTIONS[nxt[0] - x, nxt[1] - y])
+        if self.player.xy() != nxt:
+            # blocked or moved to another map, the rest of the path is stale
+            self.player_path = []
 
     def move_tilemap(self, payload: {}):
-        self.save_tilemap()
-        self.current_tilemap = payload["target_map"]
-        self.tm = Tilemap("resources/maps/tm/" + self.current_tilemap, CELL_SIZE)
-        self.player.pos = payload["pos"]
-        self.entities = []
-        self.center_on_pos(self.player.xy())
+        with profiler.scope("move_tilemap"):
+            self.save_tilemap()
+            self.hydrated[self.current_tilemap] = self.world.entities
+            self.tm.listeners.clear()
+            self.preloader.put(self.current_tilemap, self.tm)
+            self.world.clear()
+            self.current_tilemap = payload["target_map"]
+            self.load_tilemap(self.current_tilemap)
+            self.player.pos = tuple(payload["pos"])
+            self.hydrate_entities(self.current_tilemap)
+            self.center_on_pos(self.player.xy())
+
+    def load_player(self) -> bool:
+        if not self.loader.has_save():
+            return False
+        try:
+            self.player, self.current_tilemap = self.loader.load_player()
+        except (OSError, ValueError, KeyError) as e:
+            print("Could not load save [%s]: %s" % (self.save_file, e))
+            return False
+        return True
+
+    def hydrate_entities(self, map_name: str):
+        # maps visited this session keep their live entities, others are read from the save
+        entities = self.hydrated.get(map_name)
+        if entities is None:
+            entities = self.loader.load_entities(map_name)
+        for e in entities:
+            self.world.add_entity(e)
+        self.preloader.preload_from_entities(self.world.with_components(TRIGGER_COMPONENT_KEY))
+
+    def open_tilemap(self, filename: str) -> Tilemap:
+        return Tilemap("resources/maps/tm/" + filename, CELL_SIZE)
+
+    def load_tilemap(self, filename: str):
+        self.tm = self.preloader.take(filename)
+        self.map_renderer = ChunkRenderer(self.tm.width, self.tm.height, self.tm.cs, self.tm.surface_at, self.tm.fill_surf)
+        self.tm.add_listener(self.map_renderer.invalidate_region)
+        self.tm.add_listener(self.mark_dirty_region)
+        collision = CollisionGrid(self.tm)
+        self.tm.add_listener(collision.on_tiles_changed)
+        self.world.set_collision(collision)
+        self.pathfinder = Pathfinder(self.tm, self.world)
+        self.tm.add_listener(self.pathfinder.on_tiles_changed)
+        self.path_queue.reset(self.pathfinder)
+        self.dirty.mark_full()
 
     def save_tilemap(self):
-        j = {
-            "entities": [e.to_json() for e in self.entities],
-            "tilemap_filename": self.current_tilemap
-        }
-        with open("saves/%s/data/%s" % (self.save_file, self.current_tilemap), 'w') as f:
-            json.dump(j, f)
+        with profiler.scope("save_tilemap"):
+            if self.incremental_saves:
+                self.journal.record(self.current_tilemap, self.world.entities, self.world.take_removed_ids())
+                return
+            j = {
+                "entities": [e.to_json() for e in self.world.entities],
+                "tilemap_filename": self.current_tilemap
+            }
+            for e in self.world.entities:
+                e.mark_clean()
+            self.world.take_removed_ids()
+            self.journal.write_snapshot(self.current_tilemap, j)
 
     def save_player(self):
         j = {
             "current_tilemap": self.current_tilemap,
             "entity": self.player.to_json()
         }
-        with open("saves/%s/player.json" % self.save_file, 'w') as f:
-            json.dump(j, f)
+        self.saver.submit("saves/%s/player.json" % self.save_file, j)
 
     def entity_at(self, pos: (int, int)) -> Entity or None:
-        for e in self.entities:
-            if e.collides(pos):
-                return e
-        return None
+        return self.world.entity_at(pos)
 
     def center_on_player(self):
         return self.center_on_pos(self.player.xy())
 
     def center_on_pos(self, p: (int, int)):
-        self.cam[0] = p[0] - int(MAP_SIZE / 2)
-        self.cam[1] = p[1] - int(MAP_SIZE / 2)
+        cam = p[0] - int(MAP_SIZE / 2), p[1] - int(MAP_SIZE / 2)
+        if cam[0] != self.cam[0] or cam[1] != self.cam[1]:
+            self.cam[0], self.cam[1] = cam
+            self.dirty.mark_full()
 
     def rect_from_pos(self, p: (int, int)) -> py.Rect:
         return py.Rect(p[0] * self.tm.cs, p[1] * self.tm.cs, self.tm.cs, self.tm.cs)
@@ -135,7 +362,7 @@ class Game:
 
     def generate_test(self):
         # make test player
-        self.player = Player(0, "player", [7, 7])
+        self.player = Player(0, "player", (7, 7))
         a = Animation("characters.png", (0, 0), 3, 4, 32, CELL_SIZE)
         r = RenderableComponent(1, None, DIRECTION_NORTH, a)
         self.player.add_component(r)
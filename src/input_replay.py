@@ -0,0 +1,160 @@
+import json
+import os
+import shutil
+import struct
+import time
+import zlib
+
+import pygame as py
+
+from src.models.components.renderable_c import RENDER_COMPONENT_KEY
+
+# file layout (little endian):
+#   header  magic, version, length of the json block
+#   json    tick rate and the save slot files the session started from
+#   records tick, milliseconds since start, kind, code, value
+MAGIC = b"PRIR"
+VERSION = 1
+HEADER = struct.Struct("<4sHI")
+RECORD = struct.Struct("<IIBHI")
+
+KIND_KEY = 0
+KIND_MOUSE = 1
+KIND_HASH = 2
+KIND_END = 3
+
+HASH_EVERY = 1
+REPLAY_SLOT = "replay"
+TOOL_KEYS = (py.K_F3, py.K_F4)
+
+
+def read_slot(slot_dir: str) -> {str: str}:
+    files = {}
+    for root, _, names in os.walk(slot_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, "r") as f:
+                files[os.path.relpath(path, slot_dir)] = f.read()
+    return files
+
+
+def write_slot(slot_dir: str, files: {str: str}):
+    shutil.rmtree(slot_dir, ignore_errors=True)
+    for rel, text in files.items():
+        path = os.path.join(slot_dir, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+
+
+def state_hash(game) -> int:
+    # only simulation state, nothing that depends on rendering or wall time
+    h = zlib.crc32(game.current_tilemap.encode("utf-8"))
+    r = game.player.get_component_by_key(RENDER_COMPONENT_KEY)
+    p = game.player.xy()
+    h = zlib.crc32(struct.pack("<iiBB", p[0], p[1], r.direction, r.animation.curr_idx if r.animation else 0), h)
+    for e in sorted(game.world.entities, key=lambda e: e.id):
+        h = zlib.crc32(struct.pack("<iiiB", e.id, e.pos[0], e.pos[1], e.pathable), h)
+    return h
+
+
+class InputRecorder:
+
+    def __init__(self, filepath: str, hash_every: int = HASH_EVERY):
+        self.filepath = filepath
+        self.hash_every = hash_every
+        self.file = None
+        self.start = 0.0
+        self.records = 0
+
+    def open(self, slot_dir: str, tick_rate: int):
+        # the starting save is embedded so a replay begins from the same state
+        meta = json.dumps({"tick_rate": tick_rate, "hash_every": self.hash_every, "save": read_slot(slot_dir)})
+        meta = meta.encode("utf-8")
+        self.file = open(self.filepath, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, len(meta)))
+        self.file.write(meta)
+        self.start = time.perf_counter()
+
+    def write(self, tick: int, kind: int, code: int, value: int):
+        ms = int((time.perf_counter() - self.start) * 1000)
+        self.file.write(RECORD.pack(tick, ms, kind, code, value))
+        self.records += 1
+
+    def record_event(self, tick: int, event: py.event.Event):
+        if event.type == py.KEYDOWN and event.key not in TOOL_KEYS:
+            self.write(tick, KIND_KEY, 0, event.key)
+        elif event.type == py.MOUSEBUTTONDOWN:
+            self.write(tick, KIND_MOUSE, event.button, event.pos[0] | event.pos[1] << 16)
+
+    def record_state(self, tick: int, game):
+        if tick % self.hash_every == 0:
+            self.write(tick, KIND_HASH, 0, state_hash(game))
+
+    def close(self, tick: int):
+        if self.file is None:
+            return
+        self.write(tick, KIND_END, 0, 0)
+        self.file.close()
+        self.file = None
+
+
+class InputReplayer:
+
+    def __init__(self, filepath: str, fast: bool = False):
+        self.filepath = filepath
+        self.fast = fast
+        with open(filepath, "rb") as f:
+            data = f.read()
+        magic, version, meta_len = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("%s is not an input recording" % filepath)
+        if version != VERSION:
+            raise ValueError("%s has unsupported recording version %d" % (filepath, version))
+        self.meta = json.loads(data[HEADER.size:HEADER.size + meta_len].decode("utf-8"))
+        self.records = list(RECORD.iter_unpack(data[HEADER.size + meta_len:]))
+        self.idx = 0
+        self.end_tick = self.records[-1][0] if self.records and self.records[-1][2] == KIND_END else None
+        self.hashes = {r[0]: r[4] for r in self.records if r[2] == KIND_HASH}
+        self.checked = 0
+        self.diverged_at: int or None = None
+        self.frame_times: [float] = []
+
+    def restore_slot(self, slot_dir: str):
+        write_slot(slot_dir, self.meta["save"])
+
+    def events_for(self, tick: int) -> [py.event.Event]:
+        events = []
+        while self.idx < len(self.records) and self.records[self.idx][0] <= tick:
+            _, _, kind, code, value = self.records[self.idx]
+            self.idx += 1
+            if kind == KIND_KEY:
+                events.append(py.event.Event(py.KEYDOWN, key=value))
+            elif kind == KIND_MOUSE:
+                events.append(py.event.Event(py.MOUSEBUTTONDOWN, button=code, pos=(value & 0xffff, value >> 16)))
+        return events
+
+    def check_state(self, tick: int, game):
+        expected = self.hashes.get(tick)
+        if expected is None:
+            return
+        self.checked += 1
+        if self.diverged_at is None and expected != state_hash(game):
+            self.diverged_at = tick
+            print("Replay diverged at tick %d" % tick)
+
+    def finished(self, tick: int) -> bool:
+        return self.end_tick is not None and tick >= self.end_tick
+
+    def summary(self) -> {}:
+        ms = sorted(t * 1000 for t in self.frame_times)
+
+        def pct(p: float) -> float:
+            return ms[min(len(ms) - 1, int(p * len(ms)))] if ms else 0.0
+        return {
+            "recording": self.filepath,
+            "frames": len(ms),
+            "ticks_checked": self.checked,
+            "diverged_at": self.diverged_at,
+            "frame_ms": {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99), "max": ms[-1] if ms else 0.0}
+        }
@@ -1,5 +1,25 @@
+import argparse
+import json
+
 from src.game import Game
+from src.input_replay import InputRecorder, InputReplayer
 
 
 if __name__ == '__main__':
-    game = Game()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--headless", action="store_true", help="run without a window")
+    parser.add_argument("--frames", type=int, default=None, help="quit after this many frames")
+    parser.add_argument("--record", help="record input to this file")
+    parser.add_argument("--replay", help="replay input from this file")
+    parser.add_argument("--fast", action="store_true", help="replay as fast as possible instead of in real time")
+    parser.add_argument("--replay-out", help="write replay frame times and divergence to this json file")
+    args = parser.parse_args()
+    recorder = InputRecorder(args.record) if args.record else None
+    replayer = InputReplayer(args.replay, args.fast) if args.replay else None
+    game = Game(args.headless, args.frames, recorder=recorder, replayer=replayer)
+    if replayer is not None:
+        summary = replayer.summary()
+        print(json.dumps(summary, indent=2))
+        if args.replay_out:
+            with open(args.replay_out, "w") as f:
+                json.dump(summary, f, indent=2)
@@ -2,9 +2,11 @@ from src.models.object import Object
 
 
 class Component(Object):
+    __slots__ = ("owner",)
 
     def __init__(self, id: int, key: str):
         Object.__init__(self, id, key)
+        self.owner = None
 
     def to_json(self) -> {}:
         return Object.to_json(self)
@@ -0,0 +1,20 @@
+from src.models.components.component import Component
+from src.models.components.renderable_c import RENDER_COMPONENT_KEY, RenderableComponent
+from src.models.components.trigger_c import TRIGGER_COMPONENT_KEY, TriggerComponent
+
+COMPONENT_FACTORIES = {
+    RENDER_COMPONENT_KEY: RenderableComponent.from_json,
+    TRIGGER_COMPONENT_KEY: TriggerComponent.from_json,
+}
+
+
+def register_component(key: str, factory):
+    COMPONENT_FACTORIES[key] = factory
+
+
+def component_from_json(obj: {}) -> Component or None:
+    factory = COMPONENT_FACTORIES.get(obj["key"])
+    if factory is None:
+        print("Unknown component [%s]" % obj["key"])
+        return None
+    return factory(obj)
@@ -2,8 +2,8 @@ import json
 
 import pygame as py
 
-from src import utils
 from src.models.components.component import Component
+from src.rendering.sprite_cache import sprite_cache
 
 RENDER_COMPONENT_KEY = "render_c"
 DIRECTION_SOUTH = 0
@@ -13,15 +13,24 @@ DIRECTION_NORTH = 3
 
 
 class Animation:
+    __slots__ = ("filepath", "idx_start", "width", "height", "cell_w", "scaled_w", "frames", "curr_idx")
 
     def __init__(self, filepath: str, idx_start: (int, int), width: int, height: int, cell_w: int, scaled_w: int):
         self.filepath = filepath
-        self.idx_start = idx_start
+        self.idx_start = (idx_start[0], idx_start[1])
         self.width = width
         self.height = height
-        self.frames = utils.sprite_from_sheet("resources/sprites/" + self.filepath, self.idx_start, self.width, self.height, cell_w, scaled_w)
+        self.cell_w = cell_w
+        self.scaled_w = scaled_w
+        self.frames = sprite_cache.frames("resources/sprites/" + self.filepath, self.idx_start, self.width, self.height, cell_w, scaled_w)
         self.curr_idx = 0
 
+    @staticmethod
+    def from_json(obj: {}) -> 'Animation':
+        a = Animation(obj["filepath"], tuple(obj["idx_start"]), obj["width"], obj["height"], obj["cell_w"], obj["scaled_w"])
+        a.curr_idx = obj["curr_idx"]
+        return a
+
     def next_frame(self, direction: int) -> py.Surface:
         frame = self.frames[direction][self.curr_idx]
         self.curr_idx += 1
@@ -31,34 +40,82 @@ class Animation:
 
     def to_json(self) -> {}:
         return {
-            "filepath:": self.filepath,
-            "idx_start:": self.idx_start,
-            "width:": self.width,
-            "height:": self.height,
-            "curr_idx:": self.curr_idx,
+            "filepath": self.filepath,
+            "idx_start": list(self.idx_start),
+            "width": self.width,
+            "height": self.height,
+            "cell_w": self.cell_w,
+            "scaled_w": self.scaled_w,
+            "curr_idx": self.curr_idx,
         }
 
 
 class RenderableComponent(Component):
+    __slots__ = ("surface", "_direction", "animation")
 
     def __init__(self, id: int, surface: py.Surface, direction: int, animation: Animation = None):
         Component.__init__(self, id, RENDER_COMPONENT_KEY)
         self.surface: py.Surface = surface
-        self.direction = direction
+        self._direction = direction
         self.animation = animation
         if animation:
             self.surface = self.animation.next_frame(direction)
 
+    def bound(self) -> bool:
+        return self.owner is not None and self.owner.store is not None
+
+    @property
+    def direction(self) -> int:
+        if self.bound():
+            return int(self.owner.store.direction[self.owner.row])
+        return self._direction
+
+    @direction.setter
+    def direction(self, direction: int):
+        if direction != self.direction:
+            if self.bound():
+                self.owner.store.direction[self.owner.row] = direction
+            else:
+                self._direction = direction
+            self.dirty = True
+
+    def unbind(self, direction: int, frame: int):
+        self._direction = direction
+        if self.animation:
+            self.surface = self.animation.frames[direction][frame]
+            self.animation.curr_idx = (frame + 1) % len(self.animation.frames[0])
+
+    @staticmethod
+    def from_json(obj: {}) -> 'RenderableComponent':
+        if "animation" not in obj:
+            return RenderableComponent(obj["id"], None, obj["direction"])
+        animation = Animation.from_json(obj["animation"])
+        curr_idx = animation.curr_idx
+        r = RenderableComponent(obj["id"], None, obj["direction"], animation)
+        animation.curr_idx = curr_idx
+        return r
+
     def to_json(self):
         result = Component.to_json(self)
         result["direction"] = self.direction
         if self.animation:
-            result['animation'] = self.animation
+            result['animation'] = self.animation.to_json()
+            if self.bound():
+                frame = self.owner.store.frame[self.owner.row]
+                result['animation']['curr_idx'] = int(frame + 1) % len(self.animation.frames[0])
         return result
 
     def next_frame(self):
         if self.animation:
-            self.surface = self.animation.next_frame(self.direction)
+            if self.bound():
+                store, row = self.owner.store, self.owner.row
+                store.frame[row] = (store.frame[row] + 1) % store.frame_count[row]
+            else:
+                self.surface = self.animation.next_frame(self.direction)
+            self.dirty = True
 
     def get_renderable(self) -> py.Surface:
+        if self.animation and self.bound():
+            store, row = self.owner.store, self.owner.row
+            return self.animation.frames[store.direction[row]][store.frame[row]]
         return self.surface
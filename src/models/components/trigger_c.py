@@ -1,3 +1,5 @@
+import copy
+
 from src.models.components.component import Component
 
 TRIGGER_COMPONENT_KEY = "trigger_c"
@@ -7,14 +9,20 @@ TRIGGER_REMOVE_ENTITY = 1
 
 
 class TriggerComponent(Component):
+    __slots__ = ("type", "payload")
 
     def __init__(self, id: int, type: int, payload: {}):
         Component.__init__(self, id, TRIGGER_COMPONENT_KEY)
         self.type = type
         self.payload = payload
 
+    @staticmethod
+    def from_json(obj: {}) -> 'TriggerComponent':
+        return TriggerComponent(obj["id"], obj["type"], obj["payload"])
+
     def to_json(self) -> {}:
         result = Component.to_json(self)
         result["type"] = self.type
-        result["payload"] = self.payload
+        # a snapshot, the save writer serializes it later on its own thread
+        result["payload"] = copy.deepcopy(self.payload)
         return result
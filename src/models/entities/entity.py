@@ -1,40 +1,136 @@
+from src.models.components import registry
 from src.models.components.component import Component
 from src.models.object import Object
 
 
 class Entity(Object):
+    __slots__ = ("world", "store", "row", "_pos", "_pathable", "components")
 
-    def __init__(self, id: int, key: str, pos: [int, int], pathable: bool):
+    def __init__(self, id: int, key: str, pos: (int, int), pathable: bool):
         Object.__init__(self, id, key)
-        self.pos = pos
-        self.pathable = pathable
-        self.components: [Component] = []
+        self.world = None
+        self.store = None
+        self.row = -1
+        self._pos = (pos[0], pos[1])
+        self._pathable = pathable
+        self.components: {str: Component} = {}
+
+    @staticmethod
+    def from_json(obj: {}) -> 'Entity':
+        e = Entity(obj["id"], obj["key"], tuple(obj["pos"]), obj["pathable"])
+        e.load_components(obj)
+        return e
+
+    def load_components(self, obj: {}):
+        for c in obj["components"]:
+            component = registry.component_from_json(c)
+            if component is not None:
+                self.add_component(component)
+        self.mark_clean()
+
+    @property
+    def pos(self) -> (int, int):
+        if self.store is not None:
+            p = self.store.pos[self.row]
+            return int(p[0]), int(p[1])
+        return self._pos
+
+    @pos.setter
+    def pos(self, pos: (int, int)):
+        old = self.pos
+        if self.store is not None:
+            self.store.pos[self.row] = pos
+        else:
+            self._pos = (pos[0], pos[1])
+        self.dirty = True
+        if self.world is not None:
+            self.world.on_entity_moved(self, old)
+
+    @property
+    def pathable(self) -> bool:
+        if self.store is not None:
+            return bool(self.store.pathable[self.row])
+        return self._pathable
+
+    @pathable.setter
+    def pathable(self, pathable: bool):
+        old = self.pathable
+        if self.store is not None:
+            self.store.pathable[self.row] = pathable
+        else:
+            self._pathable = pathable
+        self.dirty = True
+        if self.world is not None and old != pathable:
+            self.world.on_entity_pathable_changed(self)
+
+    def bind(self, store, row: int):
+        # hot fields now live in the ecs arrays, this object becomes a view over them
+        self.store = store
+        self.row = row
+        for c in self.components.values():
+            c.owner = self
+
+    def unbind(self, pos: (int, int), pathable: bool):
+        self.store = None
+        self.row = -1
+        self._pos = pos
+        self._pathable = pathable
 
     def add_component(self, component: Component):
-        self.components.append(component)
+        # one component per key, adding another with the same key replaces it
+        self.components[component.key] = component
+        component.owner = self
+        self.dirty = True
+        if self.world is not None:
+            self.world.on_component_added(self, component)
+
+    def remove_component(self, key: str) -> Component or None:
+        component = self.components.pop(key, None)
+        if component is not None:
+            component.owner = None
+            self.dirty = True
+            if self.world is not None:
+                self.world.on_component_removed(self, component)
+        return component
+
+    def is_dirty(self) -> bool:
+        return self.dirty or any(c.dirty for c in self.components.values())
+
+    def mark_clean(self):
+        self.dirty = False
+        for c in self.components.values():
+            c.dirty = False
+
+    def delta_json(self) -> {}:
+        return {
+            "id": self.id,
+            "key": self.key,
+            "pos": list(self.pos),
+            "pathable": self.pathable,
+            "components": [c.to_json() for c in self.components.values() if c.dirty],
+            # every component still attached, so folding drops the ones removed since the last record
+            "component_ids": [c.id for c in self.components.values()]
+        }
 
     def get_component_by_key(self, key: str) -> Component or None:
-        for c in self.components:
-            if c.key == key:
-                return c
-        return None
+        return self.components.get(key)
 
     def has_component(self, key: str) -> bool:
-        for c in self.components:
-            if c.key == key:
-                return True
-        return False
+        return key in self.components
+
+    def has_components(self, keys: [str]) -> bool:
+        return all(key in self.components for key in keys)
 
     def collides(self, pos: (int, int)):
         return self.pos[0] == pos[0] and self.pos[1] == pos[1]
 
     def xy(self) -> (int, int):
-        return self.pos[0], self.pos[1]
+        return self.pos
 
     def to_json(self) -> {}:
         result = Object.to_json(self)
         result["id"] = self.id
-        result["pos"] = self.pos
+        result["pos"] = list(self.pos)
         result["pathable"] = self.pathable
-        result["components"] = [c.to_json() for c in self.components]
+        result["components"] = [c.to_json() for c in self.components.values()]
         return result
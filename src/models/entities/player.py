@@ -2,10 +2,17 @@ from src.models.entities.entity import Entity
 
 
 class Player(Entity):
+    __slots__ = ()
 
-    def __init__(self, id: id, key: str, pos: [int, int]):
+    def __init__(self, id: id, key: str, pos: (int, int)):
         Entity.__init__(self, id, key, pos, False)
 
+    @staticmethod
+    def from_json(obj: {}) -> 'Player':
+        p = Player(obj["id"], obj["key"], tuple(obj["pos"]))
+        p.load_components(obj)
+        return p
+
     def to_json(self):
         result = Entity.to_json(self)
         return result
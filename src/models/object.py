@@ -1,9 +1,11 @@
 
 class Object:
+    __slots__ = ("id", "key", "dirty")
 
     def __init__(self, id: int, key: str):
         self.id: int = id
         self.key: str = key
+        self.dirty: bool = True
 
     def to_json(self):
         return {
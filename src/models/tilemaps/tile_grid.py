@@ -0,0 +1,120 @@
+import numpy as np
+
+from src.models.tilemaps import tilemap_format
+from src.models.tilemaps.tilemap_format import TILE_DTYPE, TilemapData
+
+
+class TileGrid:
+
+    def __init__(self, tiles: np.ndarray, pathable: np.ndarray, tileset_filename: str):
+        self.tiles: np.ndarray = tiles
+        self.pathable: np.ndarray = pathable
+        self.tileset_filename = tileset_filename
+        self.listeners = []
+
+    @staticmethod
+    def blank(width: int, height: int, tileset_filename: str, tile: int = 0) -> 'TileGrid':
+        return TileGrid(np.full((height, width), tile, dtype=TILE_DTYPE),
+                        np.ones((height, width), dtype=bool),
+                        tileset_filename)
+
+    @staticmethod
+    def load(filepath: str) -> 'TileGrid':
+        data = tilemap_format.load(tilemap_format.resolve(filepath))
+        return TileGrid(data.tiles, data.pathable, data.tileset_filename)
+
+    @property
+    def width(self) -> int:
+        return self.tiles.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.tiles.shape[0]
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def notify(self, x: int, y: int, width: int, height: int):
+        for listener in self.listeners:
+            listener(x, y, width, height)
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def clip(self, x: int, y: int, width: int, height: int) -> (int, int, int, int):
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + width, self.width), min(y + height, self.height)
+        return x0, y0, max(x1 - x0, 0), max(y1 - y0, 0)
+
+    def tile_at(self, p: (int, int)) -> int:
+        return int(self.tiles[p[1], p[0]])
+
+    def pathable_at(self, p: (int, int)) -> bool:
+        return bool(self.pathable[p[1], p[0]])
+
+    def set_tile(self, p: (int, int), value: int):
+        if self.tiles[p[1], p[0]] != value:
+            self.tiles[p[1], p[0]] = value
+            self.notify(p[0], p[1], 1, 1)
+
+    def set_pathable(self, p: (int, int), value: bool):
+        if self.pathable[p[1], p[0]] != value:
+            self.pathable[p[1], p[0]] = value
+            self.notify(p[0], p[1], 1, 1)
+
+    def invert_pathable(self, p: (int, int)):
+        self.set_pathable(p, not self.pathable[p[1], p[0]])
+
+    def get_region(self, x: int, y: int, width: int, height: int) -> (np.ndarray, np.ndarray):
+        x, y, width, height = self.clip(x, y, width, height)
+        return self.tiles[y:y + height, x:x + width].copy(), self.pathable[y:y + height, x:x + width].copy()
+
+    def set_region(self, x: int, y: int, tiles: np.ndarray, pathable: np.ndarray = None):
+        # writes as much of the region as lies on the map
+        h, w = tiles.shape
+        cx, cy, cw, ch = self.clip(x, y, w, h)
+        if cw == 0 or ch == 0:
+            return
+        sx, sy = cx - x, cy - y
+        self.tiles[cy:cy + ch, cx:cx + cw] = tiles[sy:sy + ch, sx:sx + cw]
+        if pathable is not None:
+            self.pathable[cy:cy + ch, cx:cx + cw] = pathable[sy:sy + ch, sx:sx + cw]
+        self.notify(cx, cy, cw, ch)
+
+    def fill(self, x: int, y: int, width: int, height: int, tile: int, pathable: bool = None):
+        x, y, width, height = self.clip(x, y, width, height)
+        if width == 0 or height == 0:
+            return
+        self.tiles[y:y + height, x:x + width] = tile
+        if pathable is not None:
+            self.pathable[y:y + height, x:x + width] = pathable
+        self.notify(x, y, width, height)
+
+    def invert_pathable_region(self, x: int, y: int, width: int, height: int):
+        x, y, width, height = self.clip(x, y, width, height)
+        if width == 0 or height == 0:
+            return
+        region = self.pathable[y:y + height, x:x + width]
+        np.logical_not(region, out=region)
+        self.notify(x, y, width, height)
+
+    def equals(self, other: 'TileGrid') -> bool:
+        return np.array_equal(self.tiles, other.tiles) and np.array_equal(self.pathable, other.pathable)
+
+    def diff(self, other: 'TileGrid') -> np.ndarray:
+        return (self.tiles != other.tiles) | (self.pathable != other.pathable)
+
+    def copy(self) -> 'TileGrid':
+        return TileGrid(self.tiles.copy(), self.pathable.copy(), self.tileset_filename)
+
+    def to_data(self) -> TilemapData:
+        return TilemapData(self.width, self.height, self.tileset_filename, self.tiles, self.pathable)
+
+    def to_json(self) -> {}:
+        return {
+            "tileset_filename": self.tileset_filename,
+            "width": self.width,
+            "height": self.height,
+            "tiles": self.tiles.tolist(),
+            "pathable": self.pathable.tolist()
+        }
@@ -0,0 +1,112 @@
+import glob
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+from src import utils
+
+# binary layout (little endian):
+#   header  magic, version, flags, width, height, tileset name length
+#   name    utf-8 tileset filename, padded to an even length
+#   tiles   width * height uint16 tile ids, row major
+#   bits    width * height pathable flags, row major, lsb first
+MAGIC = b"PRTM"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIH")
+BINARY_EXT = ".tmb"
+TILE_DTYPE = np.dtype("<u2")
+
+
+class TilemapData:
+
+    def __init__(self, width: int, height: int, tileset_filename: str, tiles, pathable):
+        self.width = width
+        self.height = height
+        self.tileset_filename = tileset_filename
+        self.tiles = tiles
+        self.pathable = pathable
+
+
+def binary_path(filepath: str) -> str:
+    return os.path.splitext(filepath)[0] + BINARY_EXT
+
+
+def resolve(filepath: str) -> str:
+    # prefer a baked binary map when it is at least as new as its json source
+    if filepath.endswith(BINARY_EXT):
+        return filepath
+    path = binary_path(filepath)
+    if os.path.exists(path) and (not os.path.exists(filepath) or
+                                 os.path.getmtime(path) >= os.path.getmtime(filepath)):
+        return path
+    return filepath
+
+
+def pack_bits(values: np.ndarray) -> np.ndarray:
+    return np.packbits(values.ravel(), bitorder="little")
+
+
+def unpack_bits(bits, width: int, height: int) -> np.ndarray:
+    bits = np.frombuffer(bits, dtype=np.uint8)
+    return np.unpackbits(bits, count=width * height, bitorder="little").astype(bool).reshape(height, width)
+
+
+def load(filepath: str) -> TilemapData:
+    if filepath.endswith(BINARY_EXT):
+        return load_binary(filepath)
+    return load_json(filepath)
+
+
+def load_json(filepath: str) -> TilemapData:
+    obj = utils.load_json(filepath)
+    tiles = np.array(obj["tiles"], dtype=TILE_DTYPE).reshape(obj["height"], obj["width"])
+    pathable = np.array(obj["pathable"], dtype=bool).reshape(obj["height"], obj["width"])
+    return TilemapData(obj["width"], obj["height"], obj["tileset_filename"], tiles, pathable)
+
+
+def load_binary(filepath: str) -> TilemapData:
+    with open(filepath, "rb") as f:
+        # copy-on-write mapping, edits to the loaded map never reach the file
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    magic, version, flags, width, height, name_len = HEADER.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise ValueError("%s is not a binary tilemap" % filepath)
+    if version != VERSION:
+        raise ValueError("%s has unsupported tilemap version %d" % (filepath, version))
+
+    offset = HEADER.size
+    tileset_filename = mm[offset:offset + name_len].decode("utf-8")
+    offset += name_len + name_len % 2
+    count = width * height
+    # tile ids stay backed by the mapping, only the pathable bits are expanded
+    tiles = np.frombuffer(mm, dtype=TILE_DTYPE, count=count, offset=offset).reshape(height, width)
+    offset += count * TILE_DTYPE.itemsize
+    pathable = unpack_bits(mm[offset:offset + (count + 7) // 8], width, height)
+    return TilemapData(width, height, tileset_filename, tiles, pathable)
+
+
+def save_binary(filepath: str, data: TilemapData):
+    name = data.tileset_filename.encode("utf-8")
+    tmp = filepath + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, data.width, data.height, len(name)))
+        f.write(name + b"\0" * (len(name) % 2))
+        f.write(np.ascontiguousarray(data.tiles, dtype=TILE_DTYPE).tobytes())
+        f.write(pack_bits(data.pathable).tobytes())
+    os.replace(tmp, filepath)
+
+
+def convert(json_path: str) -> str:
+    path = binary_path(json_path)
+    save_binary(path, load_json(json_path))
+    return path
+
+
+if __name__ == '__main__':
+    # python -m src.models.tilemaps.tilemap_format [resources/maps/tm/*.json ...]
+    paths = sys.argv[1:] or glob.glob("resources/maps/tm/*.json")
+    for p in paths:
+        print("%s -> %s (%d bytes)" % (p, convert(p), os.path.getsize(binary_path(p))))
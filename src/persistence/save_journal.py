@@ -0,0 +1,116 @@
+import json
+import os
+from collections import OrderedDict
+
+from src.models.entities.entity import Entity
+from src.persistence.save_writer import SaveWriter
+
+COMPACT_AFTER = 256
+
+OP_UPDATE = "update"
+OP_REMOVE = "remove"
+
+
+def fold(snapshot: {}, records: [{}]) -> {}:
+    entities = OrderedDict((e["id"], e) for e in snapshot.get("entities", []))
+    for r in records:
+        if r["op"] == OP_REMOVE:
+            entities.pop(r["id"], None)
+        elif r["op"] == OP_UPDATE:
+            e = entities.get(r["id"])
+            if e is None:
+                e = entities[r["id"]] = {"id": r["id"], "components": []}
+            e["key"] = r["key"]
+            e["pos"] = r["pos"]
+            e["pathable"] = r["pathable"]
+            if "component_ids" in r:
+                kept = set(r["component_ids"])
+                e["components"] = [c for c in e["components"] if c["id"] in kept]
+            idx = {c["id"]: i for i, c in enumerate(e["components"])}
+            for c in r["components"]:
+                if c["id"] in idx:
+                    e["components"][idx[c["id"]]] = c
+                else:
+                    e["components"].append(c)
+    snapshot["entities"] = list(entities.values())
+    return snapshot
+
+
+class SaveJournal:
+
+    def __init__(self, slot_dir: str, writer: SaveWriter, compact_after: int = COMPACT_AFTER):
+        self.slot_dir = slot_dir
+        self.writer = writer
+        self.compact_after = compact_after
+        self.counts: {str: int} = {}
+
+    def journal_path(self, map_name: str) -> str:
+        return os.path.join(self.slot_dir, "journal", map_name + ".log")
+
+    def snapshot_path(self, map_name: str) -> str:
+        return os.path.join(self.slot_dir, "data", map_name)
+
+    def record_count(self, map_name: str) -> int:
+        if map_name not in self.counts:
+            try:
+                with open(self.journal_path(map_name), "r") as f:
+                    self.counts[map_name] = sum(1 for _ in f)
+            except OSError:
+                self.counts[map_name] = 0
+        return self.counts[map_name]
+
+    def record(self, map_name: str, entities: [Entity], removed_ids: [int]) -> int:
+        # only dirty entities, and only their dirty components, are written
+        records = [{"op": OP_REMOVE, "id": i} for i in removed_ids]
+        for e in entities:
+            if e.is_dirty():
+                r = e.delta_json()
+                r["op"] = OP_UPDATE
+                records.append(r)
+                e.mark_clean()
+        if not records:
+            return 0
+        count = self.record_count(map_name) + len(records)
+        self.counts[map_name] = count
+        self.writer.append(self.journal_path(map_name), records)
+        if count >= self.compact_after:
+            self.compact(map_name)
+        return len(records)
+
+    def write_snapshot(self, map_name: str, snapshot: {}):
+        self.writer.submit(self.snapshot_path(map_name), snapshot)
+        self.counts[map_name] = 0
+        self.writer.run_task("truncate:" + map_name, lambda: self.truncate(map_name))
+
+    def compact(self, map_name: str):
+        self.counts[map_name] = 0
+        self.writer.run_task("compact:" + map_name, lambda: self.compact_now(map_name))
+
+    def compact_now(self, map_name: str):
+        # runs on the writer thread, after every append queued before it
+        snapshot = self.read(map_name)
+        SaveWriter.write(self.snapshot_path(map_name), snapshot)
+        self.truncate(map_name)
+
+    def truncate(self, map_name: str):
+        if os.path.exists(self.journal_path(map_name)):
+            os.remove(self.journal_path(map_name))
+
+    def read(self, map_name: str) -> {}:
+        try:
+            with open(self.snapshot_path(map_name), "r") as f:
+                snapshot = json.load(f)
+        except OSError:
+            snapshot = {"entities": [], "tilemap_filename": map_name}
+        records = []
+        try:
+            with open(self.journal_path(map_name), "r") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # a torn line from a crash mid-append, the records after it still count
+                        continue
+        except OSError:
+            pass
+        return fold(snapshot, records)
@@ -0,0 +1,28 @@
+import json
+import os
+
+from src.models.entities.entity import Entity
+from src.models.entities.player import Player
+from src.persistence.save_journal import SaveJournal
+
+
+class SaveLoader:
+
+    def __init__(self, slot_dir: str, journal: SaveJournal):
+        self.slot_dir = slot_dir
+        self.journal = journal
+
+    def player_path(self) -> str:
+        return os.path.join(self.slot_dir, "player.json")
+
+    def has_save(self) -> bool:
+        return os.path.exists(self.player_path())
+
+    def load_player(self) -> (Player, str):
+        with open(self.player_path(), "r") as f:
+            obj = json.load(f)
+        return Player.from_json(obj["entity"]), obj["current_tilemap"]
+
+    def load_entities(self, map_name: str) -> [Entity]:
+        # snapshot plus any journal records not yet compacted into it
+        return [Entity.from_json(e) for e in self.journal.read(map_name)["entities"]]
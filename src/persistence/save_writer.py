@@ -0,0 +1,133 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+OP_WRITE = 0
+OP_APPEND = 1
+OP_TASK = 2
+
+
+class SaveWriter:
+
+    def __init__(self):
+        self.pending: OrderedDict = OrderedDict()
+        self.cond = threading.Condition()
+        self.busy = False
+        self.closed = False
+        self.writes = 0
+        self.coalesced = 0
+        self.errors: [(str, Exception)] = []
+        # files appended to this session, only touched by the writer thread
+        self.appended: set = set()
+        self.thread = threading.Thread(target=self.run, name="save-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, path: str, obj: {}):
+        # obj must already be a snapshot, the worker serializes it later
+        self.enqueue(path, OP_WRITE, obj)
+
+    def append(self, path: str, records: [{}]):
+        self.enqueue(path, OP_APPEND, list(records))
+
+    def run_task(self, key: str, task):
+        self.enqueue(key, OP_TASK, task)
+
+    def enqueue(self, key: str, op: int, payload):
+        with self.cond:
+            if self.closed:
+                raise RuntimeError("save writer is closed")
+            queued = self.pending.get(key)
+            if queued is not None:
+                self.coalesced += 1
+                if op == OP_APPEND and queued[0] == OP_APPEND:
+                    queued[1].extend(payload)
+                    return
+            self.pending[key] = [op, payload]
+            self.cond.notify_all()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if not self.pending:
+                    return
+                path, (op, payload) = self.pending.popitem(last=False)
+                self.busy = True
+            try:
+                if op == OP_WRITE:
+                    SaveWriter.write(path, payload)
+                elif op == OP_APPEND:
+                    if path not in self.appended:
+                        SaveWriter.trim_torn_tail(path)
+                        self.appended.add(path)
+                    SaveWriter.write_lines(path, payload)
+                else:
+                    payload()
+                self.writes += 1
+            except (OSError, TypeError, ValueError) as e:
+                self.errors.append((path, e))
+                print("Save failed [%s]: %s" % (path, e))
+            finally:
+                with self.cond:
+                    self.busy = False
+                    self.cond.notify_all()
+
+    @staticmethod
+    def write(path: str, obj: {}):
+        data = json.dumps(obj)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        # rename is atomic, a crash leaves either the old save or the new one
+        os.replace(tmp, path)
+
+    @staticmethod
+    def trim_torn_tail(path: str, block: int = 4096):
+        # a crash mid-append leaves a partial last line, appending onto it would glue two records
+        try:
+            f = open(path, "rb+")
+        except FileNotFoundError:
+            return
+        with f:
+            end = f.seek(0, os.SEEK_END)
+            pos = end
+            while pos > 0:
+                start = max(0, pos - block)
+                f.seek(start)
+                chunk = f.read(pos - start)
+                i = chunk.rfind(b"\n")
+                if i != -1:
+                    pos = start + i + 1
+                    break
+                pos = start
+            if pos != end:
+                f.truncate(pos)
+                f.flush()
+                os.fsync(f.fileno())
+
+    @staticmethod
+    def write_lines(path: str, records: [{}]):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "a") as f:
+            f.write("".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def flush(self, timeout: float = None) -> bool:
+        with self.cond:
+            return self.cond.wait_for(lambda: not self.pending and not self.busy, timeout)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join()
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import pygame as py
+
+CACHE_DIR = "cache/atlases"
+CACHE_VERSION = 1
+
+
+def file_hash(filepath: str) -> str:
+    with open(filepath, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def cache_paths(png_path: str, width: int, height: int, cs: int or None) -> (str, str):
+    name = os.path.splitext(os.path.basename(png_path))[0]
+    base = os.path.join(CACHE_DIR, "%s_%dx%d_%s" % (name, width, height, "native" if cs is None else cs))
+    return base + ".rgba", base + ".json"
+
+
+def read_meta(meta_path: str) -> {} or None:
+    try:
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("version") == CACHE_VERSION else None
+
+
+def write_atomic(path: str, data: bytes):
+    # the preloader and the game thread may bake the same atlas at once, so each write gets its own temp file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def write_meta(meta_path: str, meta: {}):
+    write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+
+
+def is_fresh(meta: {}, png_path: str, meta_path: str) -> bool:
+    # mtime and size are checked first, the hash only when the file was touched
+    st = os.stat(png_path)
+    if meta["mtime"] == st.st_mtime and meta["size"] == st.st_size:
+        return True
+    if meta["size"] == st.st_size and meta["sha1"] == file_hash(png_path):
+        meta["mtime"] = st.st_mtime
+        write_meta(meta_path, meta)
+        return True
+    return False
+
+
+def bake_atlas(png_path: str, width: int, height: int, cs: int or None) -> py.Surface:
+    im = py.image.load(png_path)
+    size = im.get_width() / width
+    out = int(size) if cs is None else cs
+    atlas = py.Surface((width * out, height * out), py.SRCALPHA)
+    for i in range(width * height):
+        x, y = int(i % width), int(i / width)
+        surf = im.subsurface(py.Rect(x * size, y * size, size, size))
+        scaled = py.transform.scale(surf, (out, out))
+        # atlas starts fully transparent, so a max blend copies the tile exactly
+        atlas.blit(scaled, (x * out, y * out), special_flags=py.BLEND_RGBA_MAX)
+    return atlas
+
+
+def load_atlas(png_path: str, width: int, height: int, cs: int = None) -> py.Surface:
+    data_path, meta_path = cache_paths(png_path, width, height, cs)
+    meta = read_meta(meta_path)
+    if meta is not None and os.path.exists(data_path) and is_fresh(meta, png_path, meta_path):
+        with open(data_path, "rb") as f:
+            return py.image.frombytes(f.read(), tuple(meta["atlas_size"]), "RGBA")
+
+    atlas = bake_atlas(png_path, width, height, cs)
+    st = os.stat(png_path)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    write_atomic(data_path, py.image.tobytes(atlas, "RGBA"))
+    write_meta(meta_path, {
+        "version": CACHE_VERSION,
+        "source": png_path,
+        "mtime": st.st_mtime,
+        "size": st.st_size,
+        "sha1": file_hash(png_path),
+        "atlas_size": atlas.get_size()
+    })
+    return atlas
+
+
+def load_tiles(png_path: str, width: int, height: int, cs: int = None) -> [py.Surface]:
+    atlas = load_atlas(png_path, width, height, cs)
+    size = atlas.get_width() // width
+    return [atlas.subsurface(py.Rect((i % width) * size, (i // width) * size, size, size))
+            for i in range(width * height)]
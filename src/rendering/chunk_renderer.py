@@ -0,0 +1,116 @@
+import pygame as py
+
+from src.diagnostics.profiler import profiler
+
+CHUNK_SIZE = 16
+
+
+class ChunkRenderer:
+
+    def __init__(self, width: int, height: int, cs: int, surface_at, fill_surf: py.Surface = None,
+                 chunk_size: int = CHUNK_SIZE, max_chunks: int = None):
+        self.width = width
+        self.height = height
+        self.cs = cs
+        self.surface_at = surface_at
+        self.fill_surf = fill_surf
+        self.chunk_size = chunk_size
+        self.chunk_px = chunk_size * cs
+        self.max_chunks = max_chunks
+        self.chunks: {(int, int): py.Surface} = {}
+        self.fill_chunk: py.Surface or None = None
+
+    def invalidate(self, p: (int, int)):
+        self.chunks.pop((p[0] // self.chunk_size, p[1] // self.chunk_size), None)
+
+    def invalidate_region(self, x: int, y: int, width: int, height: int):
+        if width == 1 and height == 1:
+            self.repaint((x, y))
+            return
+        for cy in range(y // self.chunk_size, (y + height - 1) // self.chunk_size + 1):
+            for cx in range(x // self.chunk_size, (x + width - 1) // self.chunk_size + 1):
+                self.chunks.pop((cx, cy), None)
+
+    def invalidate_all(self):
+        self.chunks.clear()
+
+    def chunk_in_bounds(self, cx: int, cy: int) -> bool:
+        return 0 <= cx * self.chunk_size < self.width and 0 <= cy * self.chunk_size < self.height
+
+    def chunk_at(self, cx: int, cy: int) -> py.Surface or None:
+        if not self.chunk_in_bounds(cx, cy):
+            return self.get_fill_chunk()
+        chunk = self.chunks.get((cx, cy))
+        if chunk is None:
+            profiler.count("chunk_misses")
+            chunk = self.build_chunk(cx, cy)
+            self.chunks[(cx, cy)] = chunk
+            if self.max_chunks is not None and len(self.chunks) > self.max_chunks:
+                # oldest first, the visible chunks were built last so they survive
+                del self.chunks[next(iter(self.chunks))]
+        else:
+            profiler.count("chunk_hits")
+        return chunk
+
+    def get_fill_chunk(self) -> py.Surface or None:
+        if self.fill_surf is None:
+            return None
+        if self.fill_chunk is None:
+            self.fill_chunk = py.Surface((self.chunk_px, self.chunk_px))
+            self.tile_fill(self.fill_chunk, 0, 0, self.chunk_size, self.chunk_size)
+        return self.fill_chunk
+
+    def tile_fill(self, surface: py.Surface, x0: int, y0: int, x1: int, y1: int):
+        blits = [(self.fill_surf, (x * self.cs, y * self.cs)) for y in range(y0, y1) for x in range(x0, x1)]
+        surface.blits(blits, doreturn=False)
+
+    def build_chunk(self, cx: int, cy: int) -> py.Surface:
+        chunk = py.Surface((self.chunk_px, self.chunk_px), py.SRCALPHA if self.fill_surf is None else 0)
+        if self.fill_surf is not None:
+            self.tile_fill(chunk, 0, 0, self.chunk_size, self.chunk_size)
+        ox, oy = cx * self.chunk_size, cy * self.chunk_size
+        x_end = min(self.chunk_size, self.width - ox)
+        y_end = min(self.chunk_size, self.height - oy)
+        # surface_at may return None for cells that draw nothing, as overlay layers do
+        blits = []
+        for y in range(y_end):
+            for x in range(x_end):
+                surf = self.surface_at((ox + x, oy + y))
+                if surf is not None:
+                    blits.append((surf, (x * self.cs, y * self.cs)))
+        chunk.blits(blits, doreturn=False)
+        profiler.count("tiles_drawn", len(blits))
+        return chunk
+
+    def repaint(self, p: (int, int)):
+        # redraw a single cell into its cached chunk instead of dropping the whole chunk
+        key = p[0] // self.chunk_size, p[1] // self.chunk_size
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            x = (p[0] - key[0] * self.chunk_size) * self.cs
+            y = (p[1] - key[1] * self.chunk_size) * self.cs
+            # clear the cell first, tiles with transparent pixels must not show the old tile
+            if self.fill_surf is None:
+                chunk.fill((0, 0, 0, 0), (x, y, self.cs, self.cs))
+            else:
+                chunk.blit(self.fill_surf, (x, y))
+            surf = self.surface_at(p)
+            if surf is not None:
+                chunk.blit(surf, (x, y))
+            profiler.count("tiles_drawn")
+
+    def render(self, screen: py.Surface, cam: (int, int), view_w: int, view_h: int, offset: (int, int) = (0, 0)):
+        first_cx, first_cy = cam[0] // self.chunk_size, cam[1] // self.chunk_size
+        last_cx = (cam[0] + view_w - 1) // self.chunk_size
+        last_cy = (cam[1] + view_h - 1) // self.chunk_size
+        blits = []
+        for cy in range(first_cy, last_cy + 1):
+            for cx in range(first_cx, last_cx + 1):
+                chunk = self.chunk_at(cx, cy)
+                if chunk is not None:
+                    pos = (offset[0] + (cx * self.chunk_size - cam[0]) * self.cs,
+                           offset[1] + (cy * self.chunk_size - cam[1]) * self.cs)
+                    blits.append((chunk, pos))
+        screen.blits(blits, doreturn=False)
+        profiler.count("blits", len(blits))
+        return len(blits)
@@ -0,0 +1,41 @@
+import pygame as py
+
+MAX_DIRTY_RECTS = 32
+
+
+class DirtyRects:
+
+    def __init__(self, bounds: py.Rect):
+        self.bounds = bounds
+        self.rects: [py.Rect] = []
+        self.full = True
+
+    def mark_full(self):
+        self.full = True
+        self.rects = []
+
+    def mark(self, rect: py.Rect):
+        if self.full:
+            return
+        rect = rect.clip(self.bounds)
+        if rect.width == 0 or rect.height == 0:
+            return
+        for i, r in enumerate(self.rects):
+            if r.contains(rect):
+                return
+            if rect.contains(r):
+                self.rects[i] = rect
+                return
+        self.rects.append(rect)
+        # past this many rects a single full update is cheaper than the bookkeeping
+        if len(self.rects) > MAX_DIRTY_RECTS:
+            self.mark_full()
+
+    def is_dirty(self) -> bool:
+        return self.full or len(self.rects) > 0
+
+    def take(self) -> [py.Rect]:
+        rects = [self.bounds.copy()] if self.full else self.rects
+        self.full = False
+        self.rects = []
+        return rects
@@ -0,0 +1,63 @@
+import threading
+from collections import OrderedDict
+
+import pygame as py
+
+from src import utils
+from src.diagnostics.profiler import profiler
+
+MAX_SHEETS = 8
+MAX_FRAME_SETS = 256
+
+
+class SpriteCache:
+
+    def __init__(self, max_sheets: int = MAX_SHEETS, max_frame_sets: int = MAX_FRAME_SETS):
+        self.max_sheets = max_sheets
+        self.max_frame_sets = max_frame_sets
+        self.sheets: OrderedDict = OrderedDict()
+        self.frame_sets: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def sheet(self, filepath: str) -> py.Surface:
+        with self.lock:
+            return self._sheet(filepath)
+
+    def _sheet(self, filepath: str) -> py.Surface:
+        im = self.sheets.get(filepath)
+        if im is None:
+            im = py.image.load(filepath)
+            self.sheets[filepath] = im
+            if len(self.sheets) > self.max_sheets:
+                self.sheets.popitem(last=False)
+        else:
+            self.sheets.move_to_end(filepath)
+        return im
+
+    def frames(self, filepath: str, p: (int, int), width: int, height: int, cell_size: int,
+               scaled_size: int) -> [[py.Surface]]:
+        key = filepath, (p[0], p[1]), width, height, cell_size, scaled_size
+        with self.lock:
+            frames = self.frame_sets.get(key)
+            if frames is not None:
+                self.hits += 1
+                profiler.count("sprite_hits")
+                self.frame_sets.move_to_end(key)
+                return frames
+            self.misses += 1
+            profiler.count("sprite_misses")
+            frames = utils.slice_sheet(self._sheet(filepath), p, width, height, cell_size, scaled_size)
+            self.frame_sets[key] = frames
+            if len(self.frame_sets) > self.max_frame_sets:
+                self.frame_sets.popitem(last=False)
+            return frames
+
+    def clear(self):
+        with self.lock:
+            self.sheets.clear()
+            self.frame_sets.clear()
+
+
+sprite_cache = SpriteCache()
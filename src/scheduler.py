@@ -0,0 +1,97 @@
+import time
+
+TICK_RATE = 30
+TARGET_FPS = 60
+MAX_TICKS_PER_FRAME = 5
+EVENTS_PER_SECOND = 15
+EVENT_BURST = 2
+
+
+class FixedClock:
+
+    # stands in for time.perf_counter and time.sleep, so headless frames never wait on wall time
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+class Scheduler:
+
+    def __init__(self, tick_rate: int = TICK_RATE, target_fps: int = TARGET_FPS,
+                 max_ticks_per_frame: int = MAX_TICKS_PER_FRAME, events_per_second: float = EVENTS_PER_SECOND,
+                 event_burst: int = EVENT_BURST, clock=time.perf_counter, sleep=time.sleep,
+                 measure=time.perf_counter):
+        self.tick_dt = 1 / tick_rate
+        self.frame_dt = 1 / target_fps
+        self.max_ticks_per_frame = max_ticks_per_frame
+        self.events_per_tick = events_per_second * self.tick_dt
+        self.event_burst = event_burst
+        self.clock = clock
+        self.sleep = sleep
+        # frame times always come from wall time, a paced clock may only move when slept on
+        self.measure = measure
+
+        self.accumulator = 0.0
+        self.event_tokens = float(event_burst)
+        self.last_time = clock()
+        self.frame_start = self.last_time
+        self.next_frame = self.last_time + self.frame_dt
+        self.frame_measure = measure()
+
+        self.tick_count = 0
+        self.frame_count = 0
+        self.overruns = 0
+        self.dropped_ticks = 0
+        self.last_frame_time = 0.0
+        self.worst_frame_time = 0.0
+
+    def set_target_fps(self, fps: int):
+        self.frame_dt = 1 / fps
+
+    def begin_frame(self) -> int:
+        now = self.clock()
+        self.frame_start = now
+        self.frame_measure = self.measure()
+        self.accumulator += now - self.last_time
+        self.last_time = now
+
+        ticks = int(self.accumulator / self.tick_dt)
+        if ticks > self.max_ticks_per_frame:
+            # drop the backlog rather than spiral trying to catch up
+            self.dropped_ticks += ticks - self.max_ticks_per_frame
+            ticks = self.max_ticks_per_frame
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= ticks * self.tick_dt
+        return ticks
+
+    def tick(self):
+        self.tick_count += 1
+        self.event_tokens = min(self.event_burst, self.event_tokens + self.events_per_tick)
+
+    def take_event(self) -> bool:
+        if self.event_tokens >= 1:
+            self.event_tokens -= 1
+            return True
+        return False
+
+    def alpha(self) -> float:
+        return self.accumulator / self.tick_dt
+
+    def end_frame(self):
+        now = self.clock()
+        self.frame_count += 1
+        self.last_frame_time = self.measure() - self.frame_measure
+        self.worst_frame_time = max(self.worst_frame_time, self.last_frame_time)
+
+        if now < self.next_frame:
+            self.sleep(self.next_frame - now)
+            self.next_frame += self.frame_dt
+        else:
+            self.overruns += 1
+            self.next_frame = now + self.frame_dt
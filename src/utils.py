@@ -12,8 +12,11 @@ def load_json(filepath: str):
 
 
 def sprite_from_sheet(filepath: str, p: (int, int), width: int, height: int, cell_size: int, scaled_size: int):
+    return slice_sheet(py.image.load(filepath), p, width, height, cell_size, scaled_size)
+
+
+def slice_sheet(im: py.Surface, p: (int, int), width: int, height: int, cell_size: int, scaled_size: int):
     result = []
-    im = py.image.load(filepath)
     for y in range(p[1], p[1] + height):
         line = []
         for x in range(p[0], p[0] + width):
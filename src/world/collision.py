@@ -0,0 +1,88 @@
+import numpy as np
+
+from src.models.tilemaps.tile_grid import TileGrid
+
+
+class CollisionGrid:
+
+    def __init__(self, grid: TileGrid):
+        # one bit per cell and 8 cells per byte, a set bit means blocked
+        self.grid = grid
+        self.width, self.height = grid.width, grid.height
+        # blockers per cell, wide enough that a pile of entities on one cell never wraps back to 0
+        self.counts = np.zeros((self.height, self.width), dtype=np.int32)
+        self.static = np.packbits(~grid.pathable, axis=1)
+        self.bits = self.static.copy()
+
+    def on_tiles_changed(self, x: int, y: int, width: int, height: int):
+        rows = slice(y, y + height)
+        self.static[rows] = np.packbits(~self.grid.pathable[rows], axis=1)
+        self.bits[rows] = self.static[rows] | np.packbits(self.counts[rows] > 0, axis=1)
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def update_cell(self, x: int, y: int):
+        mask = 0x80 >> (x & 7)
+        if self.counts[y, x] or self.static[y, x >> 3] & mask:
+            self.bits[y, x >> 3] |= mask
+        else:
+            self.bits[y, x >> 3] &= ~mask & 0xff
+
+    def add_blocker(self, p: (int, int)):
+        x, y = p
+        if self.in_bounds(x, y):
+            self.counts[y, x] += 1
+            self.update_cell(x, y)
+
+    def remove_blocker(self, p: (int, int)):
+        x, y = p
+        if self.in_bounds(x, y) and self.counts[y, x]:
+            self.counts[y, x] -= 1
+            self.update_cell(x, y)
+
+    def move_blocker(self, old: (int, int), new: (int, int)):
+        self.remove_blocker(old)
+        self.add_blocker(new)
+
+    def clear_blockers(self):
+        self.counts.fill(0)
+        self.bits[:] = self.static
+
+    def is_blocked(self, p: (int, int)) -> bool:
+        # anything off the map counts as blocked
+        x, y = p
+        if not self.in_bounds(x, y):
+            return True
+        return bool(self.bits[y, x >> 3] & (0x80 >> (x & 7)))
+
+    def blocked_many(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        out = np.ones(xs.shape, dtype=bool)
+        x, y = xs[inside], ys[inside]
+        out[inside] = (self.bits[y, x >> 3] >> (7 - (x & 7))) & 1 != 0
+        return out
+
+    def free_many(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        return ~self.blocked_many(xs, ys)
+
+    def blocked_in_rect(self, x: int, y: int, width: int, height: int) -> np.ndarray:
+        x, y, width, height = self.grid.clip(x, y, width, height)
+        rows = np.unpackbits(self.bits[y:y + height], axis=1, count=self.width)
+        return rows[:, x:x + width].astype(bool)
+
+    def any_blocked(self, x: int, y: int, width: int, height: int) -> bool:
+        return bool(self.blocked_in_rect(x, y, width, height).any())
+
+    def walkable(self) -> np.ndarray:
+        return np.unpackbits(self.bits, axis=1, count=self.width) == 0
+
+    def line_of_sight(self, a: (int, int), b: (int, int)) -> bool:
+        # the end cells are skipped, they usually hold the viewer and the target
+        n = max(abs(b[0] - a[0]), abs(b[1] - a[1]))
+        if n < 2:
+            return True
+        t = np.arange(1, n) / n
+        xs = np.rint(a[0] + (b[0] - a[0]) * t).astype(np.int64)
+        ys = np.rint(a[1] + (b[1] - a[1]) * t).astype(np.int64)
+        return not self.blocked_many(xs, ys).any()
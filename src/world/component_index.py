@@ -0,0 +1,46 @@
+from src.models.components.component import Component
+from src.models.entities.entity import Entity
+
+
+class ComponentIndex:
+
+    def __init__(self):
+        # dicts are used as insertion ordered sets so queries iterate deterministically
+        self.by_key: {str: {Entity: None}} = {}
+
+    def add_entity(self, e: Entity):
+        for key in e.components:
+            self.by_key.setdefault(key, {})[e] = None
+
+    def remove_entity(self, e: Entity):
+        for key in e.components:
+            self.discard(key, e)
+
+    def add_component(self, e: Entity, component: Component):
+        self.by_key.setdefault(component.key, {})[e] = None
+
+    def remove_component(self, e: Entity, component: Component):
+        self.discard(component.key, e)
+
+    def discard(self, key: str, e: Entity):
+        entities = self.by_key.get(key)
+        if entities is not None:
+            entities.pop(e, None)
+            if not entities:
+                del self.by_key[key]
+
+    def clear(self):
+        self.by_key.clear()
+
+    def count(self, key: str) -> int:
+        return len(self.by_key.get(key, ()))
+
+    def query(self, *keys: str) -> [Entity]:
+        if not keys:
+            return []
+        sets = [self.by_key.get(key) for key in keys]
+        if any(s is None for s in sets):
+            return []
+        smallest = min(sets, key=len)
+        others = [s for s in sets if s is not smallest]
+        return [e for e in smallest if all(e in s for s in others)]
@@ -0,0 +1,193 @@
+import numpy as np
+
+from src.models.components.renderable_c import RENDER_COMPONENT_KEY, DIRECTION_SOUTH, DIRECTION_WEST, \
+    DIRECTION_EAST, DIRECTION_NORTH
+from src.models.entities.entity import Entity
+
+INITIAL_CAPACITY = 64
+
+
+class Archetype:
+
+    def __init__(self, keys: frozenset, capacity: int = INITIAL_CAPACITY):
+        self.keys = keys
+        self.animated = RENDER_COMPONENT_KEY in keys
+        self.count = 0
+        self.entities: [Entity] = []
+        self.pos = np.zeros((capacity, 2), dtype=np.int32)
+        self.velocity = np.zeros((capacity, 2), dtype=np.int32)
+        self.direction = np.zeros(capacity, dtype=np.int8)
+        self.frame = np.zeros(capacity, dtype=np.int16)
+        self.frame_count = np.ones(capacity, dtype=np.int16)
+        self.pathable = np.zeros(capacity, dtype=bool)
+
+    def grow(self):
+        capacity = len(self.pos) * 2
+        for name in ("pos", "velocity", "direction", "frame", "frame_count", "pathable"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+        self.frame_count[self.count:] = 1
+
+    def append(self, e: Entity) -> int:
+        # copies the object state in, the entity must not be bound yet
+        if self.count == len(self.pos):
+            self.grow()
+        row = self.count
+        self.count += 1
+        self.entities.append(e)
+        self.pos[row] = e.pos
+        self.velocity[row] = 0
+        self.pathable[row] = e.pathable
+        r = e.get_component_by_key(RENDER_COMPONENT_KEY)
+        if r is not None:
+            self.direction[row] = r.direction
+            if r.animation is not None:
+                n = len(r.animation.frames[0])
+                self.frame_count[row] = n
+                # the animation index points at the next frame, the store keeps the shown one
+                self.frame[row] = (r.animation.curr_idx - 1) % n
+            else:
+                self.frame_count[row] = 1
+                self.frame[row] = 0
+        return row
+
+    def remove(self, row: int):
+        # swap the last row into the hole so the arrays stay dense
+        last = self.count - 1
+        if row != last:
+            for arr in (self.pos, self.velocity, self.direction, self.frame, self.frame_count, self.pathable):
+                arr[row] = arr[last]
+            moved = self.entities[last]
+            self.entities[row] = moved
+            moved.row = row
+        self.entities.pop()
+        self.count -= 1
+
+
+class EcsStorage:
+
+    def __init__(self):
+        self.archetypes: {frozenset: Archetype} = {}
+
+    def archetype_for(self, e: Entity) -> Archetype:
+        keys = frozenset(e.components)
+        arch = self.archetypes.get(keys)
+        if arch is None:
+            arch = self.archetypes[keys] = Archetype(keys)
+        return arch
+
+    def attach(self, e: Entity):
+        arch = self.archetype_for(e)
+        row = arch.append(e)
+        e.bind(arch, row)
+
+    def detach(self, e: Entity):
+        arch, row = e.store, e.row
+        pos = int(arch.pos[row, 0]), int(arch.pos[row, 1])
+        pathable = bool(arch.pathable[row])
+        direction, frame = int(arch.direction[row]), int(arch.frame[row])
+        e.unbind(pos, pathable)
+        r = e.get_component_by_key(RENDER_COMPONENT_KEY)
+        if r is not None:
+            r.unbind(direction, frame)
+        arch.remove(row)
+
+    def rebuild(self, e: Entity):
+        # the component set changed, so the entity moves to another archetype
+        self.detach(e)
+        self.attach(e)
+
+    def set_velocity(self, e: Entity, v: (int, int)):
+        e.store.velocity[e.row] = v
+
+    def clear(self):
+        for arch in self.archetypes.values():
+            for e in list(arch.entities):
+                self.detach(e)
+        self.archetypes.clear()
+
+    def count(self) -> int:
+        return sum(arch.count for arch in self.archetypes.values())
+
+
+def animate(storage: EcsStorage):
+    # advances the frame of every animated entity that is moving this tick
+    for arch in storage.archetypes.values():
+        n = arch.count
+        if not arch.animated or n == 0:
+            continue
+        moving = (arch.velocity[:n] != 0).any(axis=1)
+        frame = arch.frame[:n]
+        frame[moving] = (frame[moving] + 1) % arch.frame_count[:n][moving]
+
+
+def tile_free(pathable: np.ndarray):
+    height, width = pathable.shape
+
+    def free(xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        ok = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        ok[ok] = pathable[ys[ok], xs[ok]]
+        return ok
+    return free
+
+
+def moving(storage: EcsStorage) -> [Entity]:
+    # entities with a velocity this tick, their facing and frame change even when the move is refused
+    out = []
+    for arch in storage.archetypes.values():
+        n = arch.count
+        if n and arch.animated:
+            rows = np.nonzero((arch.velocity[:n] != 0).any(axis=1))[0]
+            out.extend(arch.entities[row] for row in rows)
+    return out
+
+
+def move(storage: EcsStorage, free) -> [(Entity, (int, int))]:
+    # free(xs, ys) tells which target cells can be entered, off the map included
+    plans = []
+    for arch in storage.archetypes.values():
+        n = arch.count
+        if n == 0:
+            continue
+        v = arch.velocity[:n]
+        moving = (v != 0).any(axis=1)
+        if not moving.any():
+            continue
+        target = arch.pos[:n] + v
+        ok = moving.copy()
+        ok[ok] = free(target[ok, 0], target[ok, 1])
+
+        vx, vy = v[:, 0], v[:, 1]
+        facing = np.select([vy > 0, vx < 0, vx > 0, vy < 0],
+                           [DIRECTION_SOUTH, DIRECTION_WEST, DIRECTION_EAST, DIRECTION_NORTH])
+        arch.direction[:n][moving] = facing[moving]
+        v[:] = 0
+        rows = np.nonzero(ok)[0]
+        plans.append((arch, rows, target[rows]))
+
+    # free() saw the grid as it was before the batch, so two blockers may pick the same cell,
+    # the first one in batch order gets it and the others stay put
+    keys = [(t[:, 0].astype(np.int64) << 32 | t[:, 1].astype(np.int64))[~arch.pathable[rows]]
+            for arch, rows, t in plans]
+    if keys:
+        keys = np.concatenate(keys)
+        _, first = np.unique(keys, return_index=True)
+        keep = np.zeros(len(keys), dtype=bool)
+        keep[first] = True
+        start = 0
+        for i, (arch, rows, t) in enumerate(plans):
+            blocking = ~arch.pathable[rows]
+            n = int(blocking.sum())
+            allowed = np.ones(len(rows), dtype=bool)
+            allowed[blocking] = keep[start:start + n]
+            start += n
+            plans[i] = arch, rows[allowed], t[allowed]
+
+    moved = []
+    for arch, rows, t in plans:
+        old = arch.pos[rows].copy()
+        arch.pos[rows] = t
+        moved.extend((arch.entities[row], (int(o[0]), int(o[1]))) for row, o in zip(rows, old))
+    return moved
@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from src.models.components.trigger_c import TRIGGER_COMPONENT_KEY, TRIGGER_MOVE_TILEMAPS
+from src.models.entities.entity import Entity
+from src.models.tilemaps.tilemap import Tilemap
+
+MAX_CACHED_MAPS = 4
+
+
+class MapPreloader:
+
+    def __init__(self, load_map, max_maps: int = MAX_CACHED_MAPS):
+        self.load_map = load_map
+        self.max_maps = max_maps
+        self.cache: OrderedDict = OrderedDict()
+        self.pending: {str: Future} = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="map-preload")
+        self.hits = 0
+        self.misses = 0
+
+    def preload(self, filename: str):
+        with self.lock:
+            if filename in self.cache or filename in self.pending:
+                return
+            self.pending[filename] = self.executor.submit(self._load, filename)
+
+    def preload_from_entities(self, entities: [Entity]):
+        for e in entities:
+            trigger = e.get_component_by_key(TRIGGER_COMPONENT_KEY)
+            if trigger and trigger.type == TRIGGER_MOVE_TILEMAPS:
+                self.preload(trigger.payload["target_map"])
+
+    def _load(self, filename: str):
+        tm = None
+        try:
+            tm = self.load_map(filename)
+        finally:
+            # a failed load must not stay pending, or the map is never preloaded again
+            with self.lock:
+                if self.pending.pop(filename, None) is not None and tm is not None:
+                    self._store(filename, tm)
+
+    def _store(self, filename: str, tm: Tilemap):
+        self.cache[filename] = tm
+        self.cache.move_to_end(filename)
+        while len(self.cache) > self.max_maps:
+            self.cache.popitem(last=False)
+
+    def put(self, filename: str, tm: Tilemap):
+        with self.lock:
+            self._store(filename, tm)
+
+    def take(self, filename: str) -> Tilemap:
+        with self.lock:
+            tm = self.cache.pop(filename, None)
+            future = self.pending.get(filename)
+        if tm is not None:
+            self.hits += 1
+            return tm
+        self.misses += 1
+        if future is not None:
+            # already decoding in the background, waiting is cheaper than starting over
+            if future.exception() is None:
+                with self.lock:
+                    tm = self.cache.pop(filename, None)
+                if tm is not None:
+                    return tm
+        # a failed background load is retried here, so the caller sees the current error if any
+        return self.load_map(filename)
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+            self.pending.clear()
+
+    def shutdown(self):
+        self.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,206 @@
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from src.world.pathfinding import JumpTables, Pathfinder, astar, jps, label_regions
+
+PATH_WORKERS = 2
+MAX_SEARCHES_PER_TICK = 8
+WORKER_NICENESS = 10
+
+# per worker process, the searches are pure python and would hold the gil on a thread
+worker_tables: (str, JumpTables) = None
+worker_regions: ((int, int), np.ndarray) = None
+
+
+def lower_priority():
+    # on a machine with few cores the game process should win every time slice
+    if hasattr(os, "nice"):
+        os.nice(WORKER_NICENESS)
+
+
+def unpack(block: shared_memory.SharedMemory, shape: (int, int), layer: int) -> np.ndarray:
+    height, width = shape
+    packed = np.ndarray((2, height, (width + 7) // 8), dtype=np.uint8, buffer=block.buf)
+    return np.unpackbits(packed[layer], axis=1, count=width) == 0
+
+
+def worker_search(name: str, shape: (int, int), static_version: (int, int), jump: bool,
+                  start: (int, int), goal: (int, int)) -> (bool, [(int, int)] or None):
+    # returns whether the goal is reachable at all, and the path when it is
+    global worker_tables, worker_regions
+    if worker_regions is None or worker_regions[0] != static_version or \
+            worker_tables is None or worker_tables[0] != name:
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            if worker_tables is None or worker_tables[0] != name:
+                worker_tables = name, JumpTables(unpack(block, shape, 0))
+            if worker_regions is None or worker_regions[0] != static_version:
+                # labelled from static tiles only, like Pathfinder.get_regions
+                worker_regions = static_version, label_regions(unpack(block, shape, 1))
+        finally:
+            block.close()
+    regions = worker_regions[1]
+    label = regions[goal[1], goal[0]]
+    if label == 0 or label != regions[start[1], start[0]]:
+        return False, None
+    tables = worker_tables[1]
+    return True, jps(tables, start, goal) if jump else astar(tables.walkable, start, goal)
+
+
+class PathQueue:
+
+    def __init__(self, workers: int = PATH_WORKERS, max_per_tick: int = MAX_SEARCHES_PER_TICK):
+        self.max_per_tick = max_per_tick
+        self.pathfinder: Pathfinder = None
+        # owner -> (start, goal), a newer request from the same owner replaces the old one
+        self.waiting: OrderedDict = OrderedDict()
+        # (start, goal) -> (version, block name, future, owners), identical requests share one search
+        self.in_flight: {((int, int), (int, int)): ((int, int), str, Future, [])} = {}
+        self.ready: [(object, [(int, int)] or None)] = []
+        # the map is shared with the workers as packed bits, one block per version
+        self.blocks: {str: shared_memory.SharedMemory} = {}
+        self.block: str = None
+        self.block_version = None
+        # bumped per map, tile versions restart at 0 with every new pathfinder
+        self.generation = 0
+        self.workers = workers
+        self.executor: ProcessPoolExecutor = None
+        self.start_executor()
+        # recordings and replays need results on a fixed tick, not whenever a worker finishes
+        self.wait = False
+        self.dispatched = 0
+        self.deduped = 0
+        self.failed = 0
+
+    def start_executor(self):
+        # spawn, forking would copy the save writer and preloader threads' locks mid use
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=lower_priority)
+
+    def restart_executor(self):
+        # a worker died, the pool refuses every later search until it is replaced
+        print("Path workers stopped, restarting them")
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.start_executor()
+
+    def reset(self, pathfinder: Pathfinder):
+        # searches still running against the previous map are dropped when they finish
+        self.pathfinder = pathfinder
+        self.generation += 1
+        self.waiting.clear()
+        self.in_flight.clear()
+        self.ready = []
+        self.block = None
+        self.block_version = None
+        self.release_blocks()
+
+    def request(self, owner, start: (int, int), goal: (int, int)):
+        self.cancel(owner)
+        self.waiting[owner] = (start[0], start[1]), (goal[0], goal[1])
+
+    def cancel(self, owner):
+        self.waiting.pop(owner, None)
+        for _, _, _, owners in self.in_flight.values():
+            if owner in owners:
+                owners.remove(owner)
+
+    def pending(self) -> int:
+        return len(self.waiting) + len(self.in_flight)
+
+    def snapshot(self) -> ((int, int), str):
+        # only the packed bits are copied on the game thread, tables and labels are built by the workers
+        version = self.pathfinder.version()
+        if self.block_version != version:
+            blocked, static = self.pathfinder.packed()
+            block = shared_memory.SharedMemory(create=True, size=max(1, blocked.nbytes + static.nbytes))
+            packed = np.ndarray((2,) + blocked.shape, dtype=np.uint8, buffer=block.buf)
+            packed[0] = blocked
+            packed[1] = static
+            self.blocks[block.name] = block
+            self.block = block.name
+            self.block_version = version
+            self.release_blocks()
+        return version, self.block
+
+    def release_blocks(self):
+        # a block is unlinked once no search can still attach to it
+        used = {name for _, name, _, _ in self.in_flight.values()}
+        for name in [n for n in self.blocks if n != self.block and n not in used]:
+            block = self.blocks.pop(name)
+            block.close()
+            block.unlink()
+
+    def dispatch(self):
+        searches = 0
+        while self.waiting and searches < self.max_per_tick:
+            owner, key = self.waiting.popitem(last=False)
+            start, goal = key
+            if key in self.in_flight:
+                self.in_flight[key][3].append(owner)
+                self.deduped += 1
+                continue
+            grid = self.pathfinder.grid
+            if not grid.in_bounds(start[0], start[1]) or not grid.in_bounds(goal[0], goal[1]):
+                self.pathfinder.rejected += 1
+                self.ready.append((owner, None))
+                continue
+            found, path = self.pathfinder.cached(start, goal)
+            if found:
+                self.ready.append((owner, path))
+                continue
+            self.pathfinder.misses += 1
+            version, name = self.snapshot()
+            try:
+                future = self.executor.submit(worker_search, name, (grid.height, grid.width),
+                                              (self.generation, version[0]), self.pathfinder.jump, start, goal)
+            except BrokenProcessPool:
+                self.restart_executor()
+                self.failed += 1
+                self.ready.append((owner, None))
+                continue
+            self.in_flight[key] = version, name, future, [owner]
+            self.dispatched += 1
+            searches += 1
+
+    def deliver(self) -> [(object, [(int, int)] or None)]:
+        # called at the start of a tick, hands out everything that finished since the last one
+        results, self.ready = self.ready, []
+        if self.wait:
+            wait([future for _, _, future, _ in self.in_flight.values()])
+        finished = [k for k, (_, _, future, _) in self.in_flight.items() if future.done()]
+        broken = False
+        for key in finished:
+            version, _, future, owners = self.in_flight.pop(key)
+            try:
+                reachable, path = future.result()
+            except Exception as e:
+                # a failed search costs its owners this one path, they can ask again
+                print("Path search failed [%s -> %s]: %s" % (key[0], key[1], e))
+                broken = broken or isinstance(e, BrokenProcessPool)
+                self.failed += 1
+                reachable, path = None, None
+            if reachable:
+                self.pathfinder.store(version, key[0], key[1], path)
+            elif reachable is not None:
+                self.pathfinder.rejected += 1
+            for owner in owners:
+                results.append((owner, None if path is None else list(path)))
+        if broken:
+            self.restart_executor()
+        if finished:
+            self.release_blocks()
+        self.dispatch()
+        return results
+
+    def shutdown(self):
+        self.waiting.clear()
+        self.in_flight.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.block = None
+        self.release_blocks()
@@ -0,0 +1,321 @@
+import heapq
+from collections import OrderedDict
+
+import numpy as np
+
+from src.diagnostics.profiler import profiler
+from src.models.tilemaps.tile_grid import TileGrid
+
+MAX_CACHED_PATHS = 256
+
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+def label_regions(walkable: np.ndarray) -> np.ndarray:
+    # 4-connected labels built from horizontal runs, 0 marks blocked cells
+    height, width = walkable.shape
+    parent = [0]
+
+    def find(r: int) -> int:
+        while parent[r] != r:
+            parent[r] = parent[parent[r]]
+            r = parent[r]
+        return r
+
+    rows = []
+    prev = []
+    for y in range(height):
+        d = np.diff(np.concatenate(([0], walkable[y].astype(np.int8), [0])))
+        runs = []
+        i = 0
+        for x0, x1 in zip(np.nonzero(d == 1)[0], np.nonzero(d == -1)[0]):
+            r = len(parent)
+            parent.append(r)
+            while i < len(prev) and prev[i][1] <= x0:
+                i += 1
+            j = i
+            while j < len(prev) and prev[j][0] < x1:
+                a, b = find(r), find(prev[j][2])
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+                j += 1
+            runs.append((x0, x1, r))
+        rows.append(runs)
+        prev = runs
+
+    labels = np.zeros((height, width), dtype=np.int32)
+    compact = {}
+    for y, runs in enumerate(rows):
+        for x0, x1, r in runs:
+            root = find(r)
+            labels[y, x0:x1] = compact.setdefault(root, len(compact) + 1)
+    return labels
+
+
+def next_stop(stop: np.ndarray, forward: bool) -> np.ndarray:
+    # for every cell, the index of the first stop cell strictly past it along axis 1
+    width = stop.shape[1]
+    idx = np.arange(width)
+    out = np.empty(stop.shape, dtype=np.int32)
+    if forward:
+        first = np.minimum.accumulate(np.where(stop, idx, width)[:, ::-1], axis=1)[:, ::-1]
+        out[:, :-1] = first[:, 1:]
+        out[:, -1] = width
+    else:
+        last = np.maximum.accumulate(np.where(stop, idx, -1), axis=1)
+        out[:, 1:] = last[:, :-1]
+        out[:, 0] = -1
+    return out
+
+
+def lands_open(walkable: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    width = walkable.shape[1]
+    inside = (stops >= 0) & (stops < width)
+    return inside & np.take_along_axis(walkable, np.clip(stops, 0, width - 1), axis=1)
+
+
+class JumpTables:
+
+    def __init__(self, walkable: np.ndarray):
+        walkable.flags.writeable = False
+        self.walkable = walkable
+        self.height, self.width = walkable.shape
+        p = np.pad(walkable, 1)
+        up, down = p[:-2, 1:-1], p[2:, 1:-1]
+        left, right = p[1:-1, :-2], p[1:-1, 2:]
+        up_left, up_right = p[:-2, :-2], p[:-2, 2:]
+        down_left, down_right = p[2:, :-2], p[2:, 2:]
+        blocked = ~walkable
+
+        # a neighbour is forced when the cell it would normally be reached from is blocked
+        self.forced_up_r = up & ~up_left
+        self.forced_down_r = down & ~down_left
+        self.forced_up_l = up & ~up_right
+        self.forced_down_l = down & ~down_right
+        self.right = next_stop(blocked | (walkable & (self.forced_up_r | self.forced_down_r)), True)
+        self.left = next_stop(blocked | (walkable & (self.forced_up_l | self.forced_down_l)), False)
+
+        # vertical jumps also stop wherever a horizontal jump would find something
+        horizontal = walkable & (lands_open(walkable, self.right) | lands_open(walkable, self.left))
+        stop_down = blocked | (walkable & ((left & ~up_left) | (right & ~up_right))) | horizontal
+        stop_up = blocked | (walkable & ((left & ~down_left) | (right & ~down_right))) | horizontal
+        self.down = next_stop(stop_down.T, True).T
+        self.up = next_stop(stop_up.T, False).T
+
+    def open_at(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height and bool(self.walkable[y, x])
+
+    def reaches(self, x: int, y: int, dx: int, target: int) -> bool:
+        # true when a horizontal run from x toward target crosses only open cells
+        s = self.right[y, x] if dx > 0 else self.left[y, x]
+        if (target - s) * dx < 0:
+            return True
+        return target == s and self.open_at(s, y)
+
+    def jump_horizontal(self, x: int, y: int, dx: int, goal: (int, int)) -> (int, int) or None:
+        if y == goal[1] and (goal[0] - x) * dx > 0 and self.reaches(x, y, dx, goal[0]):
+            return goal
+        s = int(self.right[y, x] if dx > 0 else self.left[y, x])
+        return (s, y) if self.open_at(s, y) else None
+
+    def jump_vertical(self, x: int, y: int, dy: int, goal: (int, int)) -> (int, int) or None:
+        s = int(self.down[y, x] if dy > 0 else self.up[y, x])
+        gx, gy = goal
+        if (gy - y) * dy > 0 and ((s - gy) * dy > 0 or (gy == s and self.open_at(x, s))):
+            if gx == x:
+                return goal
+            dx = 1 if gx > x else -1
+            if self.reaches(x, gy, dx, gx):
+                return x, gy
+        return (x, s) if self.open_at(x, s) else None
+
+    def successors(self, node: (int, int), d: (int, int) or None) -> [(int, int)]:
+        if d is None:
+            return DIRECTIONS
+        x, y = node
+        dx, dy = d
+        if dy != 0:
+            return (0, dy), (1, 0), (-1, 0)
+        dirs = [d]
+        if (self.forced_up_r if dx > 0 else self.forced_up_l)[y, x]:
+            dirs.append((0, -1))
+        if (self.forced_down_r if dx > 0 else self.forced_down_l)[y, x]:
+            dirs.append((0, 1))
+        return dirs
+
+    def jump(self, node: (int, int), d: (int, int), goal: (int, int)) -> (int, int) or None:
+        if d[1] == 0:
+            return self.jump_horizontal(node[0], node[1], d[0], goal)
+        return self.jump_vertical(node[0], node[1], d[1], goal)
+
+
+def manhattan(a: (int, int), b: (int, int)) -> int:
+    return abs(a[0] - b[0]) + abs(a[1] - b[1])
+
+
+def expand(points: [(int, int)]) -> [(int, int)]:
+    # jump points are joined by straight runs, the start itself is left out
+    path = []
+    for a, b in zip(points, points[1:]):
+        dx, dy = (b[0] > a[0]) - (b[0] < a[0]), (b[1] > a[1]) - (b[1] < a[1])
+        x, y = a
+        while (x, y) != b:
+            x, y = x + dx, y + dy
+            path.append((x, y))
+    return path
+
+
+def search(neighbours, start: (int, int), goal: (int, int)) -> [(int, int)] or None:
+    # neighbours(node, direction) yields (next node, direction, step cost)
+    best = {start: 0}
+    came_from = {start: None}
+    heap = [(manhattan(start, goal), 0, start, None)]
+    while heap:
+        _, g, node, d = heapq.heappop(heap)
+        if node == goal:
+            points = []
+            while node is not None:
+                points.append(node)
+                node = came_from[node]
+            return points[::-1]
+        if g > best[node]:
+            continue
+        for nxt, nd, cost in neighbours(node, d):
+            ng = g + cost
+            if ng < best.get(nxt, ng + 1):
+                best[nxt] = ng
+                came_from[nxt] = node
+                heapq.heappush(heap, (ng + manhattan(nxt, goal), ng, nxt, nd))
+    return None
+
+
+def astar(walkable: np.ndarray, start: (int, int), goal: (int, int)) -> [(int, int)] or None:
+    height, width = walkable.shape
+
+    def neighbours(node, d):
+        for dx, dy in DIRECTIONS:
+            x, y = node[0] + dx, node[1] + dy
+            if 0 <= x < width and 0 <= y < height and walkable[y, x]:
+                yield (x, y), (dx, dy), 1
+
+    points = search(neighbours, start, goal)
+    return None if points is None else points[1:]
+
+
+def jps(tables: JumpTables, start: (int, int), goal: (int, int)) -> [(int, int)] or None:
+    def neighbours(node, d):
+        for nd in tables.successors(node, d):
+            nxt = tables.jump(node, nd, goal)
+            if nxt is not None:
+                yield nxt, nd, manhattan(node, nxt)
+
+    points = search(neighbours, start, goal)
+    return None if points is None else expand(points)
+
+
+class Pathfinder:
+
+    def __init__(self, grid: TileGrid, world=None, jump: bool = True, max_paths: int = MAX_CACHED_PATHS):
+        self.grid = grid
+        self.world = world
+        self.jump = jump
+        self.max_paths = max_paths
+        self.tiles_version = 0
+        self.paths: OrderedDict = OrderedDict()
+        self.paths_version = None
+        self.regions: np.ndarray = None
+        self.regions_version = None
+        self.tables: JumpTables = None
+        self.tables_version = None
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    def on_tiles_changed(self, x: int, y: int, width: int, height: int):
+        self.tiles_version += 1
+
+    def version(self) -> (int, int):
+        return self.tiles_version, 0 if self.world is None else self.world.blockers_version
+
+    def walkable(self) -> np.ndarray:
+        # always a fresh copy, tables are rebuilt from it rather than edited in place
+        if self.world is not None and self.world.collision is not None:
+            return self.world.collision.walkable()
+        walkable = self.grid.pathable.copy()
+        if self.world is not None:
+            for e in self.world.entities:
+                x, y = e.xy()
+                if not e.pathable and self.grid.in_bounds(x, y):
+                    walkable[y, x] = False
+        return walkable
+
+    def packed(self) -> (np.ndarray, np.ndarray):
+        # blocked cells and statically blocked tiles, one bit per cell like CollisionGrid
+        if self.world is not None and self.world.collision is not None:
+            return self.world.collision.bits, self.world.collision.static
+        return np.packbits(~self.walkable(), axis=1), np.packbits(~self.grid.pathable, axis=1)
+
+    def get_regions(self) -> np.ndarray:
+        # labelled from static tiles only, entities move too often to be worth relabelling
+        if self.regions_version != self.tiles_version:
+            self.regions = label_regions(self.grid.pathable)
+            self.regions_version = self.tiles_version
+        return self.regions
+
+    def get_tables(self) -> JumpTables:
+        version = self.version()
+        if self.tables_version != version:
+            self.tables = JumpTables(self.walkable())
+            self.tables_version = version
+        return self.tables
+
+    def reachable(self, start: (int, int), goal: (int, int)) -> bool:
+        if not self.grid.in_bounds(start[0], start[1]) or not self.grid.in_bounds(goal[0], goal[1]):
+            return False
+        regions = self.get_regions()
+        label = regions[goal[1], goal[0]]
+        return label != 0 and label == regions[start[1], start[0]]
+
+    def cached(self, start: (int, int), goal: (int, int)) -> (bool, [(int, int)] or None):
+        version = self.version()
+        if self.paths_version != version:
+            self.paths.clear()
+            self.paths_version = version
+        key = start, goal
+        if key not in self.paths:
+            profiler.count("path_misses")
+            return False, None
+        self.hits += 1
+        profiler.count("path_hits")
+        self.paths.move_to_end(key)
+        path = self.paths[key]
+        return True, None if path is None else list(path)
+
+    def store(self, version: (int, int), start: (int, int), goal: (int, int), path: [(int, int)] or None):
+        if version != self.version():
+            return
+        if self.paths_version != version:
+            self.paths.clear()
+            self.paths_version = version
+        self.paths[start, goal] = path
+        while len(self.paths) > self.max_paths:
+            self.paths.popitem(last=False)
+
+    def search(self, tables: JumpTables, start: (int, int), goal: (int, int)) -> [(int, int)] or None:
+        if self.jump:
+            return jps(tables, start, goal)
+        return astar(tables.walkable, start, goal)
+
+    def find_path(self, start: (int, int), goal: (int, int)) -> [(int, int)] or None:
+        start, goal = (start[0], start[1]), (goal[0], goal[1])
+        if not self.reachable(start, goal):
+            self.rejected += 1
+            return None
+        found, path = self.cached(start, goal)
+        if found:
+            return path
+        self.misses += 1
+        version = self.version()
+        path = self.search(self.get_tables(), start, goal)
+        self.store(version, start, goal, path)
+        return None if path is None else list(path)
@@ -0,0 +1,77 @@
+from src.models.entities.entity import Entity
+
+BUCKET_SIZE = 8
+
+
+class SpatialHash:
+
+    def __init__(self, bucket_size: int = BUCKET_SIZE):
+        self.bucket_size = bucket_size
+        self.cells: {(int, int): [Entity]} = {}
+        self.buckets: {(int, int): {Entity}} = {}
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def bucket_key(self, p: (int, int)) -> (int, int):
+        return p[0] // self.bucket_size, p[1] // self.bucket_size
+
+    def insert(self, e: Entity):
+        p = e.xy()
+        self.cells.setdefault(p, []).append(e)
+        self.buckets.setdefault(self.bucket_key(p), set()).add(e)
+        self.count += 1
+
+    def remove(self, e: Entity, p: (int, int) = None):
+        p = e.xy() if p is None else (p[0], p[1])
+        cell = self.cells.get(p)
+        if cell is None or e not in cell:
+            return
+        cell.remove(e)
+        if not cell:
+            del self.cells[p]
+        key = self.bucket_key(p)
+        bucket = self.buckets[key]
+        bucket.discard(e)
+        if not bucket:
+            del self.buckets[key]
+        self.count -= 1
+
+    def move(self, e: Entity, old: (int, int)):
+        self.remove(e, old)
+        self.insert(e)
+
+    def clear(self):
+        self.cells.clear()
+        self.buckets.clear()
+        self.count = 0
+
+    def at(self, p: (int, int)) -> [Entity]:
+        return self.cells.get((p[0], p[1]), [])
+
+    def first_at(self, p: (int, int)) -> Entity or None:
+        cell = self.cells.get((p[0], p[1]))
+        return cell[0] if cell else None
+
+    def in_rect(self, x: int, y: int, width: int, height: int):
+        x1, y1 = x + width, y + height
+        bx0, by0 = self.bucket_key((x, y))
+        bx1, by1 = self.bucket_key((x1 - 1, y1 - 1))
+        for by in range(by0, by1 + 1):
+            for bx in range(bx0, bx1 + 1):
+                bucket = self.buckets.get((bx, by))
+                if bucket is None:
+                    continue
+                for e in bucket:
+                    ex, ey = e.xy()
+                    if x <= ex < x1 and y <= ey < y1:
+                        yield e
+
+    def in_radius(self, center: (int, int), radius: float):
+        r = int(radius)
+        r2 = radius * radius
+        for e in self.in_rect(center[0] - r, center[1] - r, r * 2 + 1, r * 2 + 1):
+            ex, ey = e.xy()
+            if (ex - center[0]) ** 2 + (ey - center[1]) ** 2 <= r2:
+                yield e
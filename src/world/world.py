@@ -0,0 +1,150 @@
+from src.diagnostics.profiler import profiler
+from src.models.components.component import Component
+from src.models.components.renderable_c import RENDER_COMPONENT_KEY
+from src.models.entities.entity import Entity
+from src.world import ecs
+from src.world.collision import CollisionGrid
+from src.world.component_index import ComponentIndex
+from src.world.spatial_hash import SpatialHash
+
+
+def avoiding(free, cells: [(int, int)]):
+    def check(xs, ys):
+        ok = free(xs, ys)
+        for x, y in cells:
+            ok &= (xs != x) | (ys != y)
+        return ok
+    return check
+
+
+class World:
+
+    def __init__(self, use_ecs: bool = False):
+        self.ecs: ecs.EcsStorage or None = ecs.EcsStorage() if use_ecs else None
+        self.entities: [Entity] = []
+        self.spatial = SpatialHash()
+        self.components = ComponentIndex()
+        self.removed_ids: [int] = []
+        # bumped whenever a non-pathable entity appears, leaves or moves
+        self.blockers_version = 0
+        self.collision: CollisionGrid or None = None
+
+    def add_entity(self, e: Entity):
+        e.world = self
+        self.entities.append(e)
+        self.spatial.insert(e)
+        self.components.add_entity(e)
+        if self.ecs is not None:
+            self.ecs.attach(e)
+        if not e.pathable:
+            self.add_blocker(e.xy())
+
+    def remove_entity(self, e: Entity):
+        if self.ecs is not None:
+            self.ecs.detach(e)
+        self.spatial.remove(e)
+        self.components.remove_entity(e)
+        self.entities.remove(e)
+        self.removed_ids.append(e.id)
+        if not e.pathable:
+            self.remove_blocker(e.xy())
+        e.world = None
+
+    def take_removed_ids(self) -> [int]:
+        removed, self.removed_ids = self.removed_ids, []
+        return removed
+
+    def clear(self):
+        if self.ecs is not None:
+            self.ecs.clear()
+        for e in self.entities:
+            e.world = None
+        self.entities = []
+        self.removed_ids = []
+        self.spatial.clear()
+        self.components.clear()
+        if self.collision is not None:
+            self.collision.clear_blockers()
+        self.blockers_version += 1
+
+    def set_collision(self, collision: CollisionGrid):
+        self.collision = collision
+        for e in self.entities:
+            if not e.pathable:
+                collision.add_blocker(e.xy())
+        self.blockers_version += 1
+
+    def add_blocker(self, p: (int, int)):
+        if self.collision is not None:
+            self.collision.add_blocker(p)
+        self.blockers_version += 1
+
+    def remove_blocker(self, p: (int, int)):
+        if self.collision is not None:
+            self.collision.remove_blocker(p)
+        self.blockers_version += 1
+
+    def on_entity_moved(self, e: Entity, old: (int, int)):
+        self.spatial.move(e, old)
+        if not e.pathable:
+            self.remove_blocker(old)
+            self.add_blocker(e.xy())
+
+    def on_entity_pathable_changed(self, e: Entity):
+        if e.pathable:
+            self.remove_blocker(e.xy())
+        else:
+            self.add_blocker(e.xy())
+
+    def on_component_added(self, e: Entity, component: Component):
+        self.components.add_component(e, component)
+        if self.ecs is not None:
+            self.ecs.rebuild(e)
+
+    def on_component_removed(self, e: Entity, component: Component):
+        self.components.remove_component(e, component)
+        if self.ecs is not None:
+            self.ecs.rebuild(e)
+
+    def set_velocity(self, e: Entity, v: (int, int)):
+        self.ecs.set_velocity(e, v)
+
+    def update(self, pathable, avoid: [(int, int)] = ()):
+        # runs the batched systems, only meaningful with the ecs backend
+        # avoid holds cells taken by things outside the world, such as the player
+        if self.ecs is None:
+            return
+        turned = ecs.moving(self.ecs)
+        ecs.animate(self.ecs)
+        free = self.collision.free_many if self.collision is not None else ecs.tile_free(pathable)
+        if avoid:
+            free = avoiding(free, avoid)
+        moved = ecs.move(self.ecs, free)
+        for e in turned:
+            # facing and frame were changed in the arrays, the journal reads them through the component
+            e.get_component_by_key(RENDER_COMPONENT_KEY).dirty = True
+        for e, old in moved:
+            e.dirty = True
+            self.on_entity_moved(e, old)
+        profiler.count("entities_updated", len(moved))
+
+    def with_components(self, *keys: str) -> [Entity]:
+        return self.components.query(*keys)
+
+    def is_blocked(self, pos: (int, int)) -> bool:
+        return self.collision.is_blocked(pos)
+
+    def entity_at(self, pos: (int, int)) -> Entity or None:
+        return self.spatial.first_at(pos)
+
+    def entities_at(self, pos: (int, int)) -> [Entity]:
+        return self.spatial.at(pos)
+
+    def entities_in_rect(self, x: int, y: int, width: int, height: int):
+        return self.spatial.in_rect(x, y, width, height)
+
+    def entities_in_radius(self, center: (int, int), radius: float):
+        return self.spatial.in_radius(center, radius)
+
+    def entities_in_view(self, cam: (int, int), width: int, height: int):
+        return self.spatial.in_rect(cam[0], cam[1], width, height)
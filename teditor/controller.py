@@ -1,9 +1,11 @@
-import math
 from datetime import date
 
 import numpy as numpy
 import pygame as py
 
+from overlays import GridLayers, blocked_marker
+from scaled_tiles import ScaledTileCache
+from src.rendering.chunk_renderer import ChunkRenderer
 from tilemap import Tilemap
 from tileset import *
 
@@ -25,6 +27,10 @@ BG_COLOR = WHITE
 
 TILESET_START = (20, 20)
 
+# chunk edge in pixels, so zooming in does not make each cached chunk huge
+CHUNK_PX = 256
+MAX_CHUNKS = 256
+
 LEFT_CLICK = 0
 MIDDLE_CLICK = 1
 RIGHT_CLICK = 2
@@ -32,11 +38,11 @@ RIGHT_CLICK = 2
 
 class CopyBuffer:
 
+    # only ids are kept, the scaled surfaces come from the zoom cache so a copy survives zooming
     def __init__(self, width: int, height: int):
         self.width = width
         self.height = height
-        self.scaled_buffer = [[None for x in range(width)] for y in range(height)]
-        self.tileset_ids = [[-1 for x in range(width)] for y in range(height)]
+        self.tileset_ids = numpy.full((height, width), -1)
 
 
 class Controller:
@@ -46,6 +52,10 @@ class Controller:
         self.tileset = Tileset(30, TILESET_START)
         self.tileset.new("overworld.json", "overworld.png", 30, 16)
         # self.tileset.load("town.json")
+        self.scaled_tiles = ScaledTileCache(self.tileset)
+        self.grid_layers = GridLayers()
+        self.tileset_passable = self.passable_layer(self.tileset.width, self.tileset.height, self.tileset.cell_size,
+                                                    lambda p: self.tileset.tile_at(p).pathable)
         pos = (self.tileset.rect.x + self.tileset.rect.width + PADDING, TILESET_START[1])
 
         self.map_rect = py.Rect(
@@ -69,6 +79,9 @@ class Controller:
         self.cam_pos = [0, 0]
         self.map_size = int(MAP_HEIGHT / self.get_selected_magnification())
         self.tilemap.resize(self.get_selected_magnification())
+        self.map_renderer: ChunkRenderer = None
+        self.map_passable: ChunkRenderer = None
+        self.watch_tilemap()
 
     def loop(self):
         while self.running:
@@ -107,36 +120,19 @@ class Controller:
         py.draw.rect(self.screen, MAP_COLOR, self.map_rect)
         py.draw.rect(self.screen, BLACK, self.map_rect, width=1)
 
-        # draw whole world
-        for y in range(self.map_size):
-            for x in range(self.map_size):
-                nx, ny = self.xy_to_camera_pos((x, y))
-                if self.tilemap.point_on_map(nx, ny):
-                    rect = self.get_map_rect_from_xy((x, y))
-                    idx = self.tilemap.tiles[ny][nx]
-                    xy = Controller.flattened_to_xy(idx, self.tileset.width)
-                    surf = self.tileset.tiles[xy[1]][xy[0]].surf
-                    surf = py.transform.scale(surf, (self.tilemap.cell_size, self.tilemap.cell_size))
-                    self.screen.blit(surf, rect)
-
-                    if self.editing_passable and not self.tilemap.pathable[ny][nx]:
-                        alpha_surf = py.Surface((self.tilemap.cell_size, self.tilemap.cell_size), py.SRCALPHA)
-                        py.draw.rect(alpha_surf, (150, 150, 150, ALPHA), (0, 0, self.tilemap.cell_size, self.tilemap.cell_size))
-                        py.draw.rect(alpha_surf, (255, 0, 0, 255), (0, 0, self.tilemap.cell_size, self.tilemap.cell_size), width=1)
-                        self.screen.blit(alpha_surf, rect)
+        # draw whole world from the cached chunks, panning only changes where they land
+        scaled = self.scaled_tiles.tiles(self.tilemap.cell_size)
+        self.screen.set_clip(self.map_rect)
+        self.map_renderer.render(self.screen, self.cam_pos, self.map_size, self.map_size, self.map_rect.topleft)
+        self.screen.set_clip(None)
 
+        # passability is drawn into cached layers and only redrawn where it changes
         if self.editing_passable:
-            for y in range(self.tileset.height):
-                for x in range(self.tileset.width):
-                    if not self.tileset.tile_at((x, y)).pathable:
-                        rect = py.Rect(self.tileset.rect.x + x * self.tileset.cell_size,
-                                       self.tileset.rect.y + y * self.tileset.cell_size,
-                                       self.tileset.cell_size,
-                                       self.tileset.cell_size)
-                        alpha_surf = py.Surface((self.tileset.cell_size, self.tileset.cell_size), py.SRCALPHA)
-                        py.draw.rect(alpha_surf, (150, 150, 150, ALPHA), (0, 0, self.tileset.cell_size, self.tileset.cell_size))
-                        py.draw.rect(alpha_surf, (255, 0, 0, 255), (0, 0, self.tileset.cell_size, self.tileset.cell_size), width=1)
-                        self.screen.blit(alpha_surf, rect)
+            self.screen.set_clip(self.map_rect)
+            self.map_passable.render(self.screen, self.cam_pos, self.map_size, self.map_size, self.map_rect.topleft)
+            self.screen.set_clip(None)
+            self.tileset_passable.render(self.screen, (0, 0), self.tileset.width, self.tileset.height,
+                                         self.tileset.rect.topleft)
 
         # draw grids if true
         if self.show_grid:
@@ -148,11 +144,7 @@ class Controller:
             if self.tileset.selected_tile is not None:
                 abs = self.mouse_to_xy(pos)
                 rect = self.get_map_rect_from_xy(abs)
-                surf = py.transform.scale(
-                    self.tileset.get_selected_tile().surf,
-                    (self.tilemap.cell_size, self.tilemap.cell_size)
-                )
-                self.screen.blit(surf, rect)
+                self.screen.blit(scaled[self.tileset.selected_to_flattened()], rect)
 
             # draw selected tileset tiles
             if self.selecting:
@@ -162,10 +154,7 @@ class Controller:
                 height = p[1][1] - p[0][1] + 1
 
                 if self.tileset.selected_tile is not None:
-                    surf = py.transform.scale(
-                        self.tileset.get_selected_tile().surf,
-                        (self.tilemap.cell_size, self.tilemap.cell_size)
-                    )
+                    surf = scaled[self.tileset.selected_to_flattened()]
                     for y in range(height):
                         for x in range(width):
                             new_p = cam[0] + x, cam[1] + y
@@ -184,8 +173,7 @@ class Controller:
                     for x in range(self.copy_buffer.width):
                         if self.tilemap.point_on_map(p[0] + x, p[1] + y):
                             rect = self.get_map_rect_from_xy((xy[0] + x, xy[1] + y))
-                            surf = self.copy_buffer.scaled_buffer[y][x]
-                            self.screen.blit(surf, rect)
+                            self.screen.blit(scaled[self.copy_buffer.tileset_ids[y, x]], rect)
                 rect = self.get_map_rect_from_xy(xy, self.copy_buffer.width, self.copy_buffer.height)
                 self.draw_grid(rect, self.tilemap.cell_size, (255, 255, 255))
 
@@ -219,6 +207,7 @@ class Controller:
             (g) Show grid
             (f) Save map
             (z) Undo
+            (r) Redo
             (p) Passable layer
             (lshift) Copy hovered tile
             (c) Copy selected
@@ -240,6 +229,7 @@ class Controller:
                         tileset_filename="forest.png")
                     self.tilemap.resize(self.get_selected_magnification())
                     self.cam_pos = [0, 0]
+                    self.watch_tilemap()
 
                 # move cam on wasd
                 if event.key == py.K_w:
@@ -257,6 +247,7 @@ class Controller:
                         self.selected_magnification += 1
                         self.tilemap.resize(self.get_selected_magnification())
                         self.map_size = int(MAP_HEIGHT / self.get_selected_magnification())
+                        self.reset_map_renderer()
 
                 # zoom in on plus
                 if event.key == py.K_EQUALS:
@@ -264,6 +255,7 @@ class Controller:
                         self.selected_magnification -= 1
                         self.tilemap.resize(self.get_selected_magnification())
                         self.map_size = int(MAP_HEIGHT / self.get_selected_magnification())
+                        self.reset_map_renderer()
 
                 # grow grid on G
                 if event.key == py.K_g:
@@ -284,7 +276,11 @@ class Controller:
 
                 # undo on z
                 if event.key == py.K_z:
-                    self.tilemap.pop_prev()
+                    self.tilemap.undo()
+
+                # redo on r
+                if event.key == py.K_r:
+                    self.tilemap.redo()
 
                 # copy selected on c
                 if event.key == py.K_c:
@@ -335,15 +331,11 @@ class Controller:
                     # if copying
                     if self.copy_buffer is not None:
                         if self.mouse_collides_with_tilemap(pos):
-                            self.tilemap.push_prev()
-                            for y in range(self.copy_buffer.height):
-                                for x in range(self.copy_buffer.width):
-                                    nx, ny = abs
-                                    p = (nx + x, ny + y)
-                                    if self.tilemap.point_on_map(p[0], p[1]) and self.map_point_visible(p):
-                                        id = self.copy_buffer.tileset_ids[y][x]
-                                        self.tilemap.set_point(p, id)
-                                        self.tilemap.set_pathable(p, self.tileset.tile_by_flattened_idx(id).pathable)
+                            # only paste the part of the buffer that is visible on screen
+                            ids = self.copy_buffer.tileset_ids[
+                                  :max(self.cam_pos[1] + self.map_size - abs[1], 0),
+                                  :max(self.cam_pos[0] + self.map_size - abs[0], 0)]
+                            self.tilemap.set_region(abs[0], abs[1], ids, self.tileset.pathable_array()[ids])
                             self.tilemap.deselect()
                         return
 
@@ -361,6 +353,7 @@ class Controller:
                         cam = self.tileset.mouse_to_xy(pos)
                         if self.editing_passable:
                             self.tileset.flip_pathable(cam)
+                            self.tileset_passable.repaint(cam)
                         else:
                             self.tileset.selected_tile = self.tileset.mouse_to_xy(pos)
                         return
@@ -372,18 +365,15 @@ class Controller:
                     x_len = p[1][0] - p[0][0] + 1
                     y_len = p[1][1] - p[0][1] + 1
 
-                    if self.tileset.selected_tile is not None:
-                        self.tilemap.push_prev()
-
-                    for y in range(p[0][1], p[0][1] + y_len):
-                        for x in range(p[0][0], p[0][0] + x_len):
-                            if self.tilemap.point_on_map(x, y):
-                                if self.editing_passable:
-                                    self.tilemap.invert_pathable((x, y))
-                                elif self.tileset.selected_tile is not None:
-                                    self.tilemap.set_point((x, y), self.tileset.selected_to_flattened())
-                                    pathable = self.tileset.get_selected_tile().pathable
-                                    self.tilemap.pathable[y][x] = pathable
+                    # the whole drag is one undo step, tiles and pathability together
+                    self.tilemap.history.begin()
+                    if self.editing_passable:
+                        self.tilemap.invert_pathable_region(p[0][0], p[0][1], x_len, y_len)
+                    elif self.tileset.selected_tile is not None:
+                        self.tilemap.fill(p[0][0], p[0][1], x_len, y_len,
+                                          self.tileset.selected_to_flattened(),
+                                          self.tileset.get_selected_tile().pathable)
+                    self.tilemap.history.end()
                     if self.tileset.selected_tile is not None or self.editing_passable:
                         self.deselect()
 
@@ -402,12 +392,6 @@ class Controller:
                     self.last_clicked_abs = xy
                     return
 
-    def map_point_visible(self, point: (int, int)) -> bool:
-        width = self.map_rect.width / self.tilemap.cell_size
-        height = self.map_rect.height / self.tilemap.cell_size
-        return self.cam_pos[0] <= point[0] < width + self.cam_pos[1] and \
-               self.cam_pos[1] <= point[1] < height + self.cam_pos[1]
-
     def get_map_rect_from_xy(self, pos: (int, int), width: int = 1, height: int = 1) -> py.Rect:
         return py.Rect(
             (pos[0] * self.tilemap.cell_size) + self.map_rect.x,
@@ -417,30 +401,36 @@ class Controller:
         )
 
     def draw_grid(self, rect: py.Rect, cell_size: int, color):
-        py.draw.rect(self.screen, color, rect, width=1)
-        for y in range(int(rect.height / cell_size)):
-            start_y = y * cell_size + rect.y
-            end_x = rect.x + rect.width
-            self.draw_dashed_line(color, (rect.x, start_y), (end_x, start_y), dash_length=2)
-
-        for x in range(int(rect.width / cell_size)):
-            start_x = x * cell_size + rect.x
-            end_y = rect.y + rect.height
-            self.draw_dashed_line(color, (start_x, rect.y), (start_x, end_y), dash_length=2)
+        self.screen.blit(self.grid_layers.get(rect.width, rect.height, cell_size, color), rect.topleft)
 
     def load_copy_buffer(self):
         pos = self.tilemap.selected_to_pos()
         width = pos[1][0] - pos[0][0] + 1
         height = pos[1][1] - pos[0][1] + 1
         self.copy_buffer = CopyBuffer(width, height)
-        sub_tiles = self.tilemap.get_sub_tiles(pos[0], width, height)
-        for y in range(height):
-            for x in range(width):
-                tile_idx = sub_tiles[y][x]
-                surf = py.transform.scale(self.tileset.tile_by_flattened_idx(tile_idx).surf,
-                                          (self.tilemap.cell_size, self.tilemap.cell_size))
-                self.copy_buffer.scaled_buffer[y][x] = surf
-                self.copy_buffer.tileset_ids[y][x] = tile_idx
+        self.copy_buffer.tileset_ids = self.tilemap.get_sub_tiles(pos[0], width, height).copy()
+
+    def watch_tilemap(self):
+        self.tilemap.add_listener(self.on_tiles_changed)
+        self.reset_map_renderer()
+
+    def reset_map_renderer(self):
+        cs = self.tilemap.cell_size
+        scaled = self.scaled_tiles.tiles(cs)
+        self.map_renderer = ChunkRenderer(self.tilemap.width, self.tilemap.height, cs,
+                                          lambda p: scaled[self.tilemap.tiles[p[1], p[0]]],
+                                          chunk_size=max(1, CHUNK_PX // cs), max_chunks=MAX_CHUNKS)
+        self.map_passable = self.passable_layer(self.tilemap.width, self.tilemap.height, cs,
+                                                lambda p: self.tilemap.pathable[p[1], p[0]])
+
+    def passable_layer(self, width: int, height: int, cs: int, pathable_at) -> ChunkRenderer:
+        marker = blocked_marker(cs, ALPHA)
+        return ChunkRenderer(width, height, cs, lambda p: None if pathable_at(p) else marker,
+                             chunk_size=max(1, CHUNK_PX // cs), max_chunks=MAX_CHUNKS)
+
+    def on_tiles_changed(self, x: int, y: int, width: int, height: int):
+        self.map_renderer.invalidate_region(x, y, width, height)
+        self.map_passable.invalidate_region(x, y, width, height)
 
     def deselect(self):
         self.tilemap.deselect()
@@ -485,31 +475,3 @@ class Controller:
     @staticmethod
     def pos_in_range(pos: (int, int), width: int, height: int):
         return 0 <= pos[0] < width and 0 <= pos[1] < height
-
-    def draw_dashed_line(self, color, start_pos, end_pos, width=1, dash_length=10):
-        x1, y1 = start_pos
-        x2, y2 = end_pos
-        dl = dash_length
-
-        if x1 == x2:
-            ycoords = [y for y in range(y1, y2, dl if y1 < y2 else -dl)]
-            xcoords = [x1] * len(ycoords)
-        elif y1 == y2:
-            xcoords = [x for x in range(x1, x2, dl if x1 < x2 else -dl)]
-            ycoords = [y1] * len(xcoords)
-        else:
-            a = abs(x2 - x1)
-            b = abs(y2 - y1)
-            c = round(math.sqrt(a ** 2 + b ** 2))
-            dx = dl * a / c
-            dy = dl * b / c
-
-            xcoords = [x for x in numpy.arange(x1, x2, dx if x1 < x2 else -dx)]
-            ycoords = [y for y in numpy.arange(y1, y2, dy if y1 < y2 else -dy)]
-
-        next_coords = list(zip(xcoords[1::2], ycoords[1::2]))
-        last_coords = list(zip(xcoords[0::2], ycoords[0::2]))
-        for (x1, y1), (x2, y2) in zip(next_coords, last_coords):
-            start = (round(x1), round(y1))
-            end = (round(x2), round(y2))
-            py.draw.line(self.screen, color, start, end, width)
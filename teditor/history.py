@@ -0,0 +1,123 @@
+import numpy as numpy
+
+from src.models.tilemaps.tile_grid import TileGrid
+
+MAX_HISTORY_BYTES = 32 * 1024 * 1024
+
+
+class Change:
+    __slots__ = ("bounds", "cells", "old_tiles", "new_tiles", "old_pathable", "new_pathable")
+
+    def __init__(self, bounds: (int, int, int, int), cells: numpy.ndarray,
+                 old_tiles: numpy.ndarray, new_tiles: numpy.ndarray,
+                 old_pathable: numpy.ndarray, new_pathable: numpy.ndarray):
+        self.bounds = bounds
+        self.cells = cells
+        self.old_tiles = old_tiles
+        self.new_tiles = new_tiles
+        self.old_pathable = old_pathable
+        self.new_pathable = new_pathable
+
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.cells, self.old_tiles, self.new_tiles,
+                                      self.old_pathable, self.new_pathable))
+
+
+class History:
+
+    def __init__(self, grid: TileGrid, max_bytes: int = MAX_HISTORY_BYTES):
+        # one copy of the map as it was after the last step, steps only keep the cells that differ from it
+        self.grid = grid
+        self.max_bytes = max_bytes
+        self.tiles = grid.tiles.copy()
+        self.pathable = grid.pathable.copy()
+        self.undo_steps: [Change] = []
+        self.redo_steps: [Change] = []
+        self.nbytes = 0
+        self.depth = 0
+        self.dirty: (int, int, int, int) or None = None
+        self.applying = False
+        grid.add_listener(self.on_tiles_changed)
+
+    def on_tiles_changed(self, x: int, y: int, width: int, height: int):
+        if self.applying:
+            return
+        if self.dirty is None:
+            self.dirty = x, y, x + width, y + height
+        else:
+            x0, y0, x1, y1 = self.dirty
+            self.dirty = min(x0, x), min(y0, y), max(x1, x + width), max(y1, y + height)
+        if self.depth == 0:
+            self.commit()
+
+    def begin(self):
+        # everything notified until the matching end becomes a single step
+        self.depth += 1
+
+    def end(self):
+        self.depth -= 1
+        if self.depth == 0:
+            self.commit()
+
+    def commit(self):
+        if self.dirty is None:
+            return
+        x0, y0, x1, y1 = self.dirty
+        self.dirty = None
+        rows, cols = slice(y0, y1), slice(x0, x1)
+        tiles, pathable = self.grid.tiles[rows, cols], self.grid.pathable[rows, cols]
+        changed = (tiles != self.tiles[rows, cols]) | (pathable != self.pathable[rows, cols])
+        ys, xs = numpy.nonzero(changed)
+        if len(ys) == 0:
+            return
+        cells = ((ys + y0) * self.grid.width + xs + x0).astype(numpy.int32)
+        change = Change((x0 + int(xs.min()), y0 + int(ys.min()), x0 + int(xs.max()) + 1, y0 + int(ys.max()) + 1),
+                        cells, self.tiles.flat[cells], tiles[ys, xs], self.pathable.flat[cells], pathable[ys, xs])
+        self.tiles[rows, cols] = tiles
+        self.pathable[rows, cols] = pathable
+        self.undo_steps.append(change)
+        self.nbytes += change.nbytes()
+        self.redo_steps = []
+        self.trim()
+
+    def trim(self):
+        # the oldest steps go first, the newest one is kept even when it alone is over the cap
+        while self.nbytes > self.max_bytes and len(self.undo_steps) > 1:
+            self.nbytes -= self.undo_steps.pop(0).nbytes()
+
+    def apply(self, change: Change, tiles: numpy.ndarray, pathable: numpy.ndarray):
+        for target in (self.grid, self):
+            target.tiles.flat[change.cells] = tiles
+            target.pathable.flat[change.cells] = pathable
+        x0, y0, x1, y1 = change.bounds
+        self.applying = True
+        self.grid.notify(x0, y0, x1 - x0, y1 - y0)
+        self.applying = False
+
+    def undo(self) -> bool:
+        self.commit()
+        if not self.undo_steps:
+            return False
+        change = self.undo_steps.pop()
+        self.nbytes -= change.nbytes()
+        self.apply(change, change.old_tiles, change.old_pathable)
+        self.redo_steps.append(change)
+        return True
+
+    def redo(self) -> bool:
+        self.commit()
+        if not self.redo_steps:
+            return False
+        change = self.redo_steps.pop()
+        self.apply(change, change.new_tiles, change.new_pathable)
+        self.undo_steps.append(change)
+        self.nbytes += change.nbytes()
+        return True
+
+    def clear(self):
+        self.undo_steps = []
+        self.redo_steps = []
+        self.nbytes = 0
+        self.dirty = None
+        self.tiles = self.grid.tiles.copy()
+        self.pathable = self.grid.pathable.copy()
@@ -0,0 +1,82 @@
+import math
+from collections import OrderedDict
+
+import numpy as numpy
+import pygame as py
+
+MAX_GRIDS = 8
+BLOCKED_FILL = (150, 150, 150)
+BLOCKED_BORDER = (255, 0, 0, 255)
+
+
+def draw_dashed_line(surface: py.Surface, color, start_pos, end_pos, width=1, dash_length=10):
+    x1, y1 = start_pos
+    x2, y2 = end_pos
+    dl = dash_length
+
+    if x1 == x2:
+        ycoords = [y for y in range(y1, y2, dl if y1 < y2 else -dl)]
+        xcoords = [x1] * len(ycoords)
+    elif y1 == y2:
+        xcoords = [x for x in range(x1, x2, dl if x1 < x2 else -dl)]
+        ycoords = [y1] * len(xcoords)
+    else:
+        a = abs(x2 - x1)
+        b = abs(y2 - y1)
+        c = round(math.sqrt(a ** 2 + b ** 2))
+        dx = dl * a / c
+        dy = dl * b / c
+
+        xcoords = [x for x in numpy.arange(x1, x2, dx if x1 < x2 else -dx)]
+        ycoords = [y for y in numpy.arange(y1, y2, dy if y1 < y2 else -dy)]
+
+    next_coords = list(zip(xcoords[1::2], ycoords[1::2]))
+    last_coords = list(zip(xcoords[0::2], ycoords[0::2]))
+    for (x1, y1), (x2, y2) in zip(next_coords, last_coords):
+        start = (round(x1), round(y1))
+        end = (round(x2), round(y2))
+        py.draw.line(surface, color, start, end, width)
+
+
+def draw_grid(surface: py.Surface, rect: py.Rect, cell_size: int, color):
+    py.draw.rect(surface, color, rect, width=1)
+    for y in range(int(rect.height / cell_size)):
+        start_y = y * cell_size + rect.y
+        end_x = rect.x + rect.width
+        draw_dashed_line(surface, color, (rect.x, start_y), (end_x, start_y), dash_length=2)
+
+    for x in range(int(rect.width / cell_size)):
+        start_x = x * cell_size + rect.x
+        end_y = rect.y + rect.height
+        draw_dashed_line(surface, color, (start_x, rect.y), (start_x, end_y), dash_length=2)
+
+
+def blocked_marker(cell_size: int, alpha: int) -> py.Surface:
+    surf = py.Surface((cell_size, cell_size), py.SRCALPHA)
+    py.draw.rect(surf, BLOCKED_FILL + (alpha,), (0, 0, cell_size, cell_size))
+    py.draw.rect(surf, BLOCKED_BORDER, (0, 0, cell_size, cell_size), width=1)
+    return surf
+
+
+class GridLayers:
+
+    def __init__(self, max_grids: int = MAX_GRIDS):
+        self.max_grids = max_grids
+        self.layers: OrderedDict = OrderedDict()
+
+    def get(self, width: int, height: int, cell_size: int, color) -> py.Surface:
+        # grids only depend on their size, so each one is drawn once and blitted after that
+        key = width, height, cell_size, tuple(color)
+        layer = self.layers.get(key)
+        if layer is None:
+            layer = py.Surface((width, height), py.SRCALPHA)
+            draw_grid(layer, py.Rect(0, 0, width, height), cell_size, color)
+            self.layers[key] = layer
+            while len(self.layers) > self.max_grids:
+                self.layers.popitem(last=False)
+        else:
+            self.layers.move_to_end(key)
+        return layer
+
+    def clear(self):
+        self.layers.clear()
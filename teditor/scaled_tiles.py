@@ -0,0 +1,38 @@
+from collections import OrderedDict
+
+import pygame as py
+
+from tileset import Tileset
+
+MAX_LEVELS = 3
+
+
+class ScaledTileCache:
+
+    def __init__(self, tileset: Tileset, max_levels: int = MAX_LEVELS):
+        self.tileset = tileset
+        self.max_levels = max_levels
+        self.levels: OrderedDict = OrderedDict()
+        self.png_name = tileset.png_name
+
+    def tiles(self, cell_size: int) -> [py.Surface]:
+        # flat list indexed like the tilemap, built the first time a zoom level is shown
+        if self.png_name != self.tileset.png_name:
+            self.clear()
+        tiles = self.levels.get(cell_size)
+        if tiles is None:
+            tiles = [py.transform.scale(tile.surf, (cell_size, cell_size))
+                     for line in self.tileset.tiles for tile in line]
+            self.levels[cell_size] = tiles
+            while len(self.levels) > self.max_levels:
+                self.levels.popitem(last=False)
+        else:
+            self.levels.move_to_end(cell_size)
+        return tiles
+
+    def tile(self, idx: int, cell_size: int) -> py.Surface:
+        return self.tiles(cell_size)[idx]
+
+    def clear(self):
+        self.levels.clear()
+        self.png_name = self.tileset.png_name
@@ -1,63 +1,44 @@
-import copy
 import os
 
+import numpy as numpy
 import pygame as py
 import json
 
-from src import utils
+from history import History
+from src.models.tilemaps import tilemap_format
+from src.models.tilemaps.tile_grid import TileGrid
 
 
-class Tilemap:
+class Tilemap(TileGrid):
 
     def __init__(self, filename: str, cell_size: int, width: int = -1, height: int = -1, tileset_filename: str = ""):
         self.filename = filename
-        self.tiles = []
-        self.pathable = []
-        self.prev_states = []
         self.cell_size = cell_size
         self.selected_start = None
         self.selected_end = None
 
         if not os.path.exists("resources/maps/tm/" + self.filename):
-            self.width = width
-            self.height = height
-            self.tileset_filename = tileset_filename
-            self.tiles = [[0 for x in range(self.width)] for y in range(self.height)]
-            self.pathable = [[True for x in range(self.width)] for y in range(self.height)]
+            grid = TileGrid.blank(width, height, tileset_filename)
         else:
-            obj = utils.load_json("resources/maps/tm/" + self.filename)
-            self.tiles = obj["tiles"]
-            self.tileset_filename = obj["tileset_filename"]
-            self.pathable = obj["pathable"]
-            self.width = obj["width"]
-            self.height = obj["height"]
+            grid = TileGrid.load("resources/maps/tm/" + self.filename)
+        TileGrid.__init__(self, grid.tiles, grid.pathable, grid.tileset_filename)
+        self.history = History(self)
 
         self.rect = py.Rect(0, 0, self.cell_size * self.width, self.cell_size * self.height)
 
     def save(self):
-        to_write = {
-            "tileset_filename": self.tileset_filename,
-            "width": self.width,
-            "height": self.height,
-            "cell_size": self.cell_size,
-            "tiles": self.tiles,
-            "pathable": self.pathable
-        }
+        to_write = self.to_json()
+        to_write["cell_size"] = self.cell_size
         f = open("resources/maps/tm/" + self.filename, 'w')
         json.dump(to_write, f)
         f.close()
+        tilemap_format.save_binary(tilemap_format.binary_path("resources/maps/tm/" + self.filename), self.to_data())
 
     def set_point(self, pos: (int, int), value: int):
-        self.tiles[pos[1]][pos[0]] = value
+        self.set_tile(pos, value)
 
     def set(self, x: int, y: int, value: int):
-        self.tiles[y][x] = value
-
-    def invert_pathable(self, pos: (int, int)):
-        self.pathable[pos[1]][pos[0]] = not self.pathable[pos[1]][pos[0]]
-
-    def set_pathable(self, pos: (int, int), value: bool):
-        self.pathable[pos[1]][pos[0]] = value
+        self.set_tile((x, y), value)
 
     def deselect(self):
         self.selected_start = None
@@ -76,37 +57,16 @@ class Tilemap:
     def point_on_map(self, x: int, y: int):
         return 0 <= x < self.width and 0 <= y < self.height
 
-    def pop_prev(self):
-        if len(self.prev_states) > 0:
-            idx = len(self.prev_states) - 1
-            self.tiles = self.prev_states.pop(idx)
-
-    def push_prev(self):
-        if len(self.prev_states) > 0:
-            if not self.compare_states(self.prev_states[-1], self.tiles):
-                print("Pushing state")
-                self.prev_states.append(copy.deepcopy(self.tiles))
-            else:
-                print("Ignoring state push")
-        else:
-            print("Pushing state")
-            self.prev_states.append(copy.deepcopy(self.tiles))
-
-    def compare_states(self, left, right) -> bool:
-        for y in range(self.height):
-            for x in range(self.width):
-                if left[y][x] != right[y][x]:
-                    return False
-        return True
-
-    def get_sub_tiles(self, pos: (int, int), width: int, height: int) -> [[py.Surface]]:
-        result = []
-        for j in range(pos[1], pos[1] + height):
-            line = []
-            for i in range(pos[0], pos[0] + width):
-                line.append(self.tiles[j][i])
-            result.append(line)
-        return result
+    def undo(self):
+        if not self.history.undo():
+            print("Nothing to undo")
+
+    def redo(self):
+        if not self.history.redo():
+            print("Nothing to redo")
+
+    def get_sub_tiles(self, pos: (int, int), width: int, height: int) -> numpy.ndarray:
+        return self.tiles[pos[1]:pos[1] + height, pos[0]:pos[0] + width]
 
     def set_rect_centered_on(self, pos: (int, int)):
         self.rect.x = pos[0] - self.rect.width / 2
@@ -1,8 +1,10 @@
 import json
 
+import numpy as numpy
 import pygame as py
 
 from src import utils
+from src.rendering import atlas_cache
 
 
 class Tile:
@@ -67,6 +69,9 @@ class Tileset:
     def set_pathable(self, p: (int, int), value: bool):
         self.tile_at(p).pathable = value
 
+    def pathable_array(self) -> numpy.ndarray:
+        return numpy.array([tile.pathable for line in self.tiles for tile in line], dtype=bool)
+
     def tile_at(self, xy: (int, int)) -> Tile:
         return self.tiles[xy[1]][xy[0]]
 
@@ -95,17 +100,17 @@ class Tileset:
         return x, y
 
     def load_tiles(self, pathable: [[bool]] = None):
-        im = py.image.load("resources/maps/images/" + self.png_name)
-        self.base_size = int(im.get_width() / self.width)
+        png_path = "resources/maps/images/" + self.png_name
+        surfs = atlas_cache.load_tiles(png_path, self.width, self.height)
+        scaled = atlas_cache.load_tiles(png_path, self.width, self.height, self.cell_size)
+        self.base_size = surfs[0].get_width()
         for y in range(self.height):
             line = []
             for x in range(self.width):
-                rect = py.Rect(x * self.base_size, y * self.base_size, self.base_size, self.base_size)
-                surf = im.subsurface(rect)
-                scaled = py.transform.scale(surf, (self.cell_size, self.cell_size))
+                i = y * self.width + x
                 if pathable is not None:
-                    t = Tile(y * self.width + x, pathable[y][x], surf, scaled)
+                    t = Tile(i, pathable[y][x], surfs[i], scaled[i])
                 else:
-                    t = Tile(y * self.width + x, True, surf, scaled)
+                    t = Tile(i, True, surfs[i], scaled[i])
                 line.append(t)
             self.tiles.append(line)
@@ -0,0 +1,60 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "src")]
+
+import pytest
+
+from src.models.components.trigger_c import TRIGGER_COMPONENT_KEY, TRIGGER_REMOVE_ENTITY, TriggerComponent
+from src.models.entities.entity import Entity
+from src.persistence.save_journal import SaveJournal
+from src.persistence.save_loader import SaveLoader
+from src.persistence.save_writer import SaveWriter
+
+MAP_NAME = "test_map"
+
+
+@pytest.fixture
+def journal(tmp_path):
+    writer = SaveWriter()
+    yield SaveJournal(str(tmp_path), writer)
+    writer.close()
+
+
+def record(journal: SaveJournal, entities: [Entity], removed_ids: [int] = ()):
+    journal.record(MAP_NAME, entities, list(removed_ids))
+    assert journal.writer.flush(5)
+
+
+def test_removed_component_stays_removed(journal):
+    door = Entity(1, "door", (3, 4), False)
+    door.add_component(TriggerComponent(7, TRIGGER_REMOVE_ENTITY, {"pos": [3, 4]}))
+    record(journal, [door])
+
+    door.remove_component(TRIGGER_COMPONENT_KEY)
+    record(journal, [door])
+
+    loaded = SaveLoader(journal.slot_dir, journal).load_entities(MAP_NAME)
+    assert [e.id for e in loaded] == [1]
+    assert loaded[0].components == {}
+
+
+def test_untouched_components_survive_a_removal(journal):
+    door = Entity(1, "door", (3, 4), False)
+    door.add_component(TriggerComponent(7, TRIGGER_REMOVE_ENTITY, {"pos": [3, 4]}))
+    record(journal, [door])
+
+    door.pos = (5, 4)
+    record(journal, [door])
+
+    loaded = SaveLoader(journal.slot_dir, journal).load_entities(MAP_NAME)
+    assert loaded[0].pos == (5, 4)
+    assert loaded[0].get_component_by_key(TRIGGER_COMPONENT_KEY).payload == {"pos": [3, 4]}
+
+
+def test_removed_entity(journal):
+    door = Entity(1, "door", (3, 4), False)
+    record(journal, [door])
+    record(journal, [], [1])
+    assert SaveLoader(journal.slot_dir, journal).load_entities(MAP_NAME) == []
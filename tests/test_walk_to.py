@@ -0,0 +1,64 @@
+import os
+import shutil
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "src")]
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+import numpy as np
+import pygame as py
+import pytest
+
+from src.game import Game, STEP_DIRECTIONS
+
+SAVE_SLOT = "test_walk_to"
+
+
+class StillGame(Game):
+
+    # the tests drive update() themselves
+    def loop(self):
+        pass
+
+
+@pytest.fixture
+def game():
+    os.chdir(ROOT)
+    py.init()
+    shutil.rmtree(os.path.join("saves", SAVE_SLOT), ignore_errors=True)
+    shutil.copytree(os.path.join("saves", "one"), os.path.join("saves", SAVE_SLOT))
+    g = StillGame(headless=True, save_file=SAVE_SLOT)
+    g.path_queue.wait = True
+    yield g
+    g.preloader.shutdown()
+    g.path_queue.shutdown()
+    g.saver.close()
+    shutil.rmtree(os.path.join("saves", SAVE_SLOT), ignore_errors=True)
+
+
+def walk_until_idle(g: Game, ticks: int = 300):
+    for _ in range(ticks):
+        g.update()
+        if g.player_path:
+            x, y = g.player.xy()
+            assert (g.player_path[0][0] - x, g.player_path[0][1] - y) in STEP_DIRECTIONS
+        if not g.player_path and not g.path_queue.pending():
+            return
+
+
+def test_new_destination_while_walking(game):
+    # a second click lands between the request and the delivery of the first path
+    rng = np.random.default_rng(3)
+    regions = game.pathfinder.get_regions()
+    for _ in range(40):
+        x, y = game.player.xy()
+        cells = np.argwhere(regions == regions[y, x])
+        first, second = (tuple(int(v) for v in cells[rng.integers(len(cells))][::-1]) for _ in range(2))
+        game.walk_to(first)
+        for _ in range(int(rng.integers(1, 8))):
+            game.update()
+        game.walk_to(second)
+        walk_until_idle(game)
+        assert game.player.xy() == second